@@ -6,12 +6,20 @@ This module initializes the Flask application with all necessary configurations,
 database connections, and AI service integrations.
 """
 
-from flask import Flask
+from flask import Flask, current_app
+from flask.json.provider import JSONProvider
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_cors import CORS
+from flask_caching import Cache
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from werkzeug.http import http_date
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
-from datetime import datetime
+from datetime import date
+from decimal import Decimal
+import orjson
 import pymysql
 from dotenv import load_dotenv
 
@@ -23,6 +31,54 @@ pymysql.install_as_MySQLdb()
 # Initialize extensions
 db = SQLAlchemy()
 login_manager = LoginManager()
+cache = Cache()
+limiter = Limiter(key_func=get_remote_address)
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson, so jsonify and returned dicts skip the stdlib encoder.
+    Output matches Flask's default provider: dates as HTTP dates, Decimals as strings.
+    """
+    
+    # Route dates through default() instead of orjson's native ISO 8601 output
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, date):
+            return http_date(obj)
+        if isinstance(obj, Decimal):
+            return str(obj)
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        if hasattr(obj, '__html__'):
+            return str(obj.__html__())
+        raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response instead of round-tripping through str
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.options),
+            mimetype='application/json'
+        )
+
+def dump_json_column(obj):
+    """Serialize a JSON column value with orjson; SQLAlchemy expects text."""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+# Cache backends every worker process reads and writes, so deleting an entry reaches them all
+SHARED_CACHE_TYPES = {'RedisCache', 'RedisSentinelCache', 'RedisClusterCache', 'MemcachedCache', 'SASLMemcachedCache'}
+
+def cache_is_shared():
+    """Whether the configured cache is shared between workers rather than held per process."""
+    return current_app.config.get('CACHE_TYPE', '').rsplit('.', 1)[-1] in SHARED_CACHE_TYPES
 
 def create_app(config_name='development'):
     """
@@ -36,6 +92,7 @@ def create_app(config_name='development'):
         template_folder=os.path.join(base_dir, '..', 'templates'),
         static_folder=os.path.join(base_dir, '..', 'static')
     )
+    app.json = OrjsonProvider(app)
     
     # Configuration
     if config_name == 'development':
@@ -45,18 +102,60 @@ def create_app(config_name='development'):
         app.config['DEBUG'] = True
         app.config['UPLOAD_FOLDER'] = 'uploads'
         app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
+        app.config['CACHE_TYPE'] = 'SimpleCache'
+        app.config['RATELIMIT_STORAGE_URI'] = 'memory://'
         
     elif config_name == 'production':
         app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'production-secret-key')
         app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
         app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
         app.config['DEBUG'] = False
+        app.config['TEMPLATES_AUTO_RELOAD'] = False
         app.config['UPLOAD_FOLDER'] = 'uploads'
         app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024
+        app.config['CACHE_TYPE'] = 'RedisCache' if os.environ.get('REDIS_URL') else 'SimpleCache'
+        app.config['CACHE_REDIS_URL'] = os.environ.get('REDIS_URL')
+        app.config['RATELIMIT_STORAGE_URI'] = os.environ.get('REDIS_URL', 'memory://')
+        
+        # Production runs behind one proxy (the Heroku router); take the client address from the
+        # X-Forwarded-For entry it appends, so rate limits apply per client rather than per proxy
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1)
         
+    # Keep compiled SQL for more statement shapes than SQLAlchemy's default of 500,
+    # so per-keystroke search queries skip SQL compilation; let flushes that insert
+    # many rows send up to 10,000 per statement, matching bulk_insert's batches;
+    # and parse JSON columns with orjson rather than the stdlib decoder
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'query_cache_size': 1200,
+        'insertmanyvalues_page_size': 10_000,
+        'json_serializer': dump_json_column,
+        'json_deserializer': orjson.loads
+    }
+    
+    # Each Gunicorn worker holds its own pool, so the database must allow at least
+    # (pool_size + max_overflow) * workers connections, e.g. 90 for the Procfile's 3 workers.
+    # Connections are checked before use, recycled ahead of MySQL's idle timeout, and
+    # handed out most-recently-used first so a hot subset stays warm under light load.
+    # SQLite files need none of this and in-memory databases reject the sizing options.
+    if not (app.config['SQLALCHEMY_DATABASE_URI'] or '').startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'].update({
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_pre_ping': True,
+            'pool_recycle': 1800,
+            'pool_use_lifo': True
+        })
+    
+    # Timestamp columns default to the server's CURRENT_TIMESTAMP, which MySQL reports in the
+    # session time zone; pin sessions to UTC so those values match the app's datetime.utcnow()
+    if (app.config['SQLALCHEMY_DATABASE_URI'] or '').startswith('mysql'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {'init_command': "SET time_zone = '+00:00'"}
+    
     # Initialize extensions
     db.init_app(app)
     login_manager.init_app(app)
+    cache.init_app(app)
+    limiter.init_app(app)
     CORS(app)
     
     # Configure login manager
@@ -13,7 +13,9 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
 from database.models import User, Lesson, Flashcard, Question, RevisionLog, EngagementMetric
 from app import db
+from app.lessons import related_to_recent_studies, list_loading
 from sqlalchemy import or_, func
+from sqlalchemy.orm import selectinload, undefer
 from datetime import datetime
 import json
 
@@ -57,7 +59,11 @@ def api_lessons():
             )
         
         # Execute query with pagination
-        lessons = query.order_by(Lesson.created_at.desc()).paginate(
+        # Load the ids for the content counts alongside the page
+        lessons = query.options(*list_loading(
+            selectinload(Lesson.flashcards).load_only(Flashcard.id),
+            selectinload(Lesson.questions).load_only(Question.id)
+        )).order_by(Lesson.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
         
@@ -75,8 +81,8 @@ def api_lessons():
                 'duration': lesson.estimated_duration,
                 'created_at': lesson.created_at.isoformat(),
                 'tags': lesson.tags,
-                'flashcards_count': lesson.flashcards.count(),
-                'questions_count': lesson.questions.count()
+                'flashcards_count': len(lesson.flashcards),
+                'questions_count': len(lesson.questions)
             })
         
         return jsonify({
@@ -102,14 +108,16 @@ def api_lesson_detail(lesson_id):
     """
     
     try:
-        lesson = Lesson.query.get_or_404(lesson_id)
+        lesson = Lesson.query.options(
+            undefer(Lesson.key_points), selectinload(Lesson.flashcards), selectinload(Lesson.questions)
+        ).get_or_404(lesson_id)
         
         if not lesson.is_published:
             return jsonify({'success': False, 'error': 'Lesson not found'}), 404
         
         # Get lesson content
-        flashcards = lesson.flashcards.all()
-        questions = lesson.questions.all()
+        flashcards = lesson.flashcards
+        questions = lesson.questions
         
         # Format flashcards
         flashcards_data = []
@@ -167,12 +175,12 @@ def api_lesson_flashcards(lesson_id):
     """
     
     try:
-        lesson = Lesson.query.get_or_404(lesson_id)
+        lesson = Lesson.query.options(selectinload(Lesson.flashcards)).get_or_404(lesson_id)
         
         if not lesson.is_published:
             return jsonify({'success': False, 'error': 'Lesson not found'}), 404
         
-        flashcards = lesson.flashcards.all()
+        flashcards = lesson.flashcards
         
         flashcards_data = []
         for flashcard in flashcards:
@@ -201,12 +209,12 @@ def api_lesson_questions(lesson_id):
     """
     
     try:
-        lesson = Lesson.query.get_or_404(lesson_id)
+        lesson = Lesson.query.options(selectinload(Lesson.questions)).get_or_404(lesson_id)
         
         if not lesson.is_published:
             return jsonify({'success': False, 'error': 'Lesson not found'}), 404
         
-        questions = lesson.questions.all()
+        questions = lesson.questions
         
         questions_data = []
         for question in questions:
@@ -380,29 +388,12 @@ def api_user_recommendations():
     """
     
     try:
-        # Get user's learning history
-        user_revision_logs = RevisionLog.query.filter_by(user_id=current_user.id)\
-            .order_by(RevisionLog.timestamp.desc()).limit(10).all()
-        
-        # Get subjects and topics the user has studied
-        studied_subjects = set()
-        studied_topics = set()
-        
-        for log in user_revision_logs:
-            lesson = Lesson.query.get(log.lesson_id)
-            if lesson:
-                studied_subjects.add(lesson.subject)
-                studied_topics.add(lesson.topic)
-        
         # Find related lessons
         related_lessons = Lesson.query.filter(
             Lesson.is_published == True,
-            Lesson.age_group_target == current_user.age_group.value,
-            or_(
-                Lesson.subject.in_(list(studied_subjects)),
-                Lesson.topic.in_(list(studied_topics))
-            )
-        ).filter(Lesson.id.notin_([log.lesson_id for log in user_revision_logs])).limit(10).all()
+            Lesson.age_group_target == current_user.age_group,
+            related_to_recent_studies(current_user.id)
+        ).limit(10).all()
         
         # Format recommendations
         recommendations = []
@@ -10,15 +10,83 @@ This module handles:
 - Age-appropriate content access
 """
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from database.models import User, UserRole, AgeGroup, db
+from database.models import User, UserRole, AgeGroup, db, password_hasher, verify_password, invalidate_cached_user, preference_overrides
+from app import cache, cache_is_shared, limiter
+from app.background import BatchWriter
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime
+import orjson
 import re
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+# Basic shape check for email addresses at signup and validation time
+EMAIL_PATTERN = re.compile(r'^[^@]+@[^@]+\.[^@]+$')
+
+# Verified against when no account matches, so unknown usernames take as long as wrong passwords
+DUMMY_PASSWORD_HASH = password_hasher.hash('')
+
+def record_last_logins(user_ids):
+    """Stamp last_login for every user who signed in since the previous flush."""
+    user_ids = set(user_ids)
+    db.session.execute(
+        update(User).where(User.id.in_(user_ids)).values(last_login=datetime.utcnow())
+    )
+    db.session.commit()
+    
+    for user_id in user_ids:
+        invalidate_cached_user(user_id)
+
+# Batches last_login writes so a successful login only costs the password check
+last_login_writer = BatchWriter('last-login-writer', record_last_logins)
+
+# Default interface preferences for new accounts, by age group
+AGE_GROUP_PREFERENCES = {
+    'children': {
+        'theme_preference': 'colorful',
+        'font_size': 'large',
+        'accessibility_features': {'high_contrast': True, 'simple_navigation': True}
+    },
+    'teens': {
+        'theme_preference': 'modern',
+        'font_size': 'medium',
+        'accessibility_features': {'gamification': True}
+    }
+}
+DEFAULT_PREFERENCES = {
+    'theme_preference': 'professional',
+    'font_size': 'medium',
+    'accessibility_features': {}
+}
+
+# Seconds a serialized user-info response is reused before being rebuilt, with a shared cache
+USER_INFO_CACHE_TIMEOUT = 60
+
+def user_info_cache_key(user_id):
+    """Cache key for a user's serialized user-info response."""
+    return f'userinfo:{user_id}'
+
+# Seconds an availability lookup for the signup validators is reused
+AVAILABILITY_CACHE_TIMEOUT = 30
+
+@cache.memoize(timeout=AVAILABILITY_CACHE_TIMEOUT)
+def username_taken(username):
+    """Whether an account already uses this username."""
+    return User.query.with_entities(User.id).filter_by(username=username).first() is not None
+
+@cache.memoize(timeout=AVAILABILITY_CACHE_TIMEOUT)
+def email_taken(email):
+    """Whether an account already uses this email address."""
+    return User.query.with_entities(User.id).filter_by(email=email).first() is not None
+
+def invalidate_user_info(user_id):
+    """Drop a user's cached user-info response after their profile changes."""
+    cache.delete(user_info_cache_key(user_id))
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     """
@@ -43,11 +111,20 @@ def login():
             (User.username == username) | (User.email == username)
         ).first()
         
-        if user and user.check_password(password):
+        if user:
+            password_valid = user.check_password(password)
+        else:
+            verify_password(DUMMY_PASSWORD_HASH, password)
+            password_valid = False
+        
+        if password_valid:
             if user.is_active:
                 login_user(user, remember=remember)
-                user.last_login = datetime.utcnow()
-                db.session.commit()
+                
+                # Save a password rehash right away; last_login is stamped in the background
+                if db.session.is_modified(user):
+                    db.session.commit()
+                last_login_writer.add(user.id)
                 
                 # Redirect based on user role
                 if user.role == UserRole.TEACHER:
@@ -97,7 +174,7 @@ def signup():
         if not username or len(username) < 3:
             errors.append('Username must be at least 3 characters long.')
         
-        if not email or not re.match(r'^[^@]+@[^@]+\.[^@]+$', email):
+        if not email or not EMAIL_PATTERN.match(email):
             errors.append('Please provide a valid email address.')
         
         if not password or len(password) < 8:
@@ -109,11 +186,15 @@ def signup():
         if not first_name or not last_name:
             errors.append('Please provide both first and last names.')
         
-        # Check if username or email already exists
-        if User.query.filter_by(username=username).first():
+        # Check if username or email already exists with a single lookup
+        existing_accounts = User.query.with_entities(User.username, User.email).filter(
+            (User.username == username) | (User.email == email)
+        ).all()
+        
+        if any(account.username == username for account in existing_accounts):
             errors.append('Username already exists. Please choose another.')
         
-        if User.query.filter_by(email=email).first():
+        if any(account.email == email for account in existing_accounts):
             errors.append('Email already registered. Please use another email or login.')
         
         # Validate role and age group combinations
@@ -129,38 +210,39 @@ def signup():
             return render_template('auth/signup.html')
         
         try:
-            # Create new user
-            user = User(
+            # Insert the new user in a single Core statement, skipping the ORM unit of work
+            defaults = AGE_GROUP_PREFERENCES.get(age_group, DEFAULT_PREFERENCES)
+            db.session.execute(insert(User).values(
                 username=username,
                 email=email,
+                password_hash=password_hasher.hash(password),
                 first_name=first_name,
                 last_name=last_name,
                 role=UserRole(role),
                 age_group=AgeGroup(age_group),
-                date_of_birth=datetime.strptime(date_of_birth, '%Y-%m-%d').date() if date_of_birth else None
-            )
-            user.set_password(password)
-            
-            # Set default preferences based on age group
-            if age_group == 'children':
-                user.theme_preference = 'colorful'
-                user.font_size = 'large'
-                user.accessibility_features = {'high_contrast': True, 'simple_navigation': True}
-            elif age_group == 'teens':
-                user.theme_preference = 'modern'
-                user.font_size = 'medium'
-                user.accessibility_features = {'gamification': True}
-            else:
-                user.theme_preference = 'professional'
-                user.font_size = 'medium'
-                user.accessibility_features = {}
-            
-            db.session.add(user)
+                date_of_birth=datetime.strptime(date_of_birth, '%Y-%m-%d').date() if date_of_birth else None,
+                preferences=preference_overrides({
+                    'theme_preference': defaults['theme_preference'],
+                    'font_size': defaults['font_size']
+                }),
+                # Give each account its own copy of the shared default features dict
+                accessibility_features=dict(defaults['accessibility_features'])
+            ))
             db.session.commit()
             
+            # Stop the validators reporting the new username/email as available
+            cache.delete_memoized(username_taken, username)
+            cache.delete_memoized(email_taken, email)
+            
             flash('Account created successfully! Please login to continue.', 'success')
             return redirect(url_for('auth.login'))
             
+        except IntegrityError:
+            # Lost a race with another signup using the same username or email
+            db.session.rollback()
+            flash('Username or email already registered. Please choose another.', 'error')
+            return render_template('auth/signup.html')
+            
         except Exception as e:
             db.session.rollback()
             flash(f'Error creating account: {str(e)}', 'error')
@@ -214,17 +296,22 @@ def edit_profile():
             current_user.first_name = first_name
             current_user.last_name = last_name
             current_user.bio = bio
-            current_user.theme_preference = theme_preference
-            current_user.font_size = font_size
-            current_user.high_contrast = high_contrast
+            current_user.preferences = preference_overrides({
+                **current_user.get_preferences(),
+                'theme_preference': theme_preference,
+                'font_size': font_size,
+                'high_contrast': high_contrast
+            })
             
-            # Update accessibility features
-            current_user.accessibility_features.update({
+            # Reassign rather than mutate so the JSON column is flagged as changed
+            current_user.accessibility_features = {
+                **(current_user.accessibility_features or {}),
                 'high_contrast': high_contrast,
                 'font_size': font_size
-            })
+            }
             
             db.session.commit()
+            invalidate_user_info(current_user.id)
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('auth.profile'))
             
@@ -267,6 +354,7 @@ def change_password():
             # Update password
             current_user.set_password(new_password)
             db.session.commit()
+            invalidate_user_info(current_user.id)
             flash('Password changed successfully!', 'success')
             return redirect(url_for('auth.profile'))
             
@@ -279,7 +367,8 @@ def change_password():
 @auth_bp.route('/forgot-password', methods=['GET', 'POST'])
 def forgot_password():
     """
-    Forgot password functionality (placeholder for email integration).
+    Forgot password page. Reset emails are not sent yet, so every address gets the same
+    guidance and no account is looked up.
     """
     
     if request.method == 'POST':
@@ -289,14 +378,8 @@ def forgot_password():
             flash('Please provide your email address.', 'error')
             return render_template('auth/forgot_password.html')
         
-        # Check if user exists
-        user = User.query.filter_by(email=email).first()
-        
-        if user:
-            # TODO: Implement email password reset functionality
-            flash('Password reset instructions have been sent to your email.', 'info')
-        else:
-            flash('No account found with that email address.', 'error')
+        # Same response for every address so the form cannot be used to probe for accounts
+        flash('Password reset by email is not available yet. Please ask an administrator to reset your password.', 'info')
     
     return render_template('auth/forgot_password.html')
 
@@ -308,21 +391,31 @@ def api_user_info():
     Used by frontend for personalization and UI adaptation.
     """
     
-    user_info = {
-        'id': current_user.id,
-        'username': current_user.username,
-        'full_name': current_user.get_full_name(),
-        'role': current_user.role.value,
-        'age_group': current_user.age_group.value,
-        'theme_preference': current_user.theme_preference,
-        'font_size': current_user.font_size,
-        'high_contrast': current_user.high_contrast,
-        'accessibility_features': current_user.accessibility_features
-    }
+    # Only a shared cache sees the invalidation when another worker saves a profile edit
+    use_cache = cache_is_shared()
+    cache_key = user_info_cache_key(current_user.id)
+    body = cache.get(cache_key) if use_cache else None
+    
+    if body is None:
+        user_info = {
+            'id': current_user.id,
+            'username': current_user.username,
+            'full_name': current_user.get_full_name(),
+            'role': current_user.role.value,
+            'age_group': current_user.age_group.value,
+            'theme_preference': current_user.pref('theme_preference'),
+            'font_size': current_user.pref('font_size'),
+            'high_contrast': current_user.pref('high_contrast'),
+            'accessibility_features': current_user.accessibility_features
+        }
+        body = orjson.dumps({'success': True, 'user': user_info})
+        if use_cache:
+            cache.set(cache_key, body, timeout=USER_INFO_CACHE_TIMEOUT)
     
-    return jsonify({'success': True, 'user': user_info})
+    return current_app.response_class(body, mimetype='application/json')
 
 @auth_bp.route('/api/validate-username/<username>')
+@limiter.limit('10/minute')
 def api_validate_username(username):
     """
     API endpoint for username validation during registration.
@@ -331,21 +424,22 @@ def api_validate_username(username):
     if len(username) < 3:
         return jsonify({'valid': False, 'message': 'Username must be at least 3 characters long.'})
     
-    if User.query.filter_by(username=username).first():
+    if username_taken(username):
         return jsonify({'valid': False, 'message': 'Username already exists.'})
     
     return jsonify({'valid': True, 'message': 'Username is available.'})
 
 @auth_bp.route('/api/validate-email/<email>')
+@limiter.limit('10/minute')
 def api_validate_email(email):
     """
     API endpoint for email validation during registration.
     """
     
-    if not re.match(r'^[^@]+@[^@]+\.[^@]+$', email):
+    if not EMAIL_PATTERN.match(email):
         return jsonify({'valid': False, 'message': 'Please provide a valid email address.'})
     
-    if User.query.filter_by(email=email).first():
+    if email_taken(email):
         return jsonify({'valid': False, 'message': 'Email already registered.'})
     
     return jsonify({'valid': True, 'message': 'Email is available.'})
@@ -0,0 +1,76 @@
+"""
+EduMorph Background Writers
+Buffered database writes that are kept off the request path.
+
+This module provides:
+- BatchWriter, an in-process buffer flushed periodically by a daemon thread
+"""
+
+from flask import current_app
+from app import db
+import atexit
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+class BatchWriter:
+    """
+    Collects items during requests and hands them to a flush callback in batches.
+    The callback runs in a background thread inside an application context.
+    """
+    
+    def __init__(self, name, flush, interval=5.0, max_batch=500):
+        self.name = name
+        self.interval = interval
+        self.max_batch = max_batch
+        self._write_batch = flush
+        self._items = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._app = None
+        self._pid = None
+    
+    def add(self, item):
+        """Queue an item, starting this process's flush thread on first use."""
+        with self._lock:
+            self._items.append(item)
+            # Worker processes forked after a start need their own thread
+            if self._pid != os.getpid():
+                self._start()
+            batch_full = len(self._items) >= self.max_batch
+        
+        if batch_full:
+            self._wakeup.set()
+    
+    def flush(self):
+        """Write out everything buffered so far."""
+        with self._lock:
+            items, self._items = self._items, []
+        
+        if not items or self._app is None:
+            return
+        
+        with self._app.app_context():
+            try:
+                self._write_batch(items)
+            except Exception:
+                # Any failure drops this batch only; the flush thread must survive it
+                db.session.rollback()
+                logger.exception("Error flushing %d buffered writes for %s", len(items), self.name)
+    
+    def _start(self):
+        self._app = current_app._get_current_object()
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, name=self.name, daemon=True).start()
+        atexit.register(self.flush)
+    
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Error in flush thread for %s", self.name)
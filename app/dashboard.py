@@ -9,25 +9,43 @@ This module handles:
 - Admin dashboard with platform analytics and management
 """
 
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for, current_app
 from flask_login import login_required, current_user
-from database.models import User, Lesson, Flashcard, Question, RevisionLog, EngagementMetric, UserRole
-from app import db
-from sqlalchemy import func
-from datetime import datetime, timedelta
-import json
+from database.models import User, Lesson, Flashcard, Question, RevisionLog, EngagementMetric, UserRole, ActivityType, TEACHING_ROLES
+from app import db, cache
+from app.lessons import list_loading
+from sqlalchemy import func, and_, or_, literal, event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+from datetime import datetime, date, timedelta
+import logging
+import orjson
+
+logger = logging.getLogger(__name__)
 
 dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 
+# Recommended lessons are cached per age group under a version bumped on every lesson write
+RECOMMENDED_LESSONS_VERSION_KEY = 'recommended_lessons:version'
+RECOMMENDED_LESSONS_CACHE_TIMEOUT = 300
+
+# Lesson activities reported on the teacher dashboard, keyed to their stat names
+LESSON_ENGAGEMENT_FIELDS = {
+    ActivityType.LESSON_VIEW: 'total_views',
+    ActivityType.FLASHCARD_REVIEW: 'flashcard_reviews',
+    ActivityType.QUIZ_ATTEMPT: 'quiz_attempts'
+}
+
 @dashboard_bp.route('/')
 @login_required
 def dashboard_index():
     """Redirect user to role-appropriate dashboard."""
-    if current_user.role == UserRole.STUDENT:
+    role = current_user.role
+    if role == UserRole.STUDENT:
         return redirect(url_for('dashboard.student_dashboard'))
-    if current_user.role == UserRole.TEACHER or current_user.role == UserRole.ADMIN:
+    if role in TEACHING_ROLES:
         return redirect(url_for('dashboard.teacher_dashboard'))
-    if current_user.role == UserRole.PARENT:
+    if role == UserRole.PARENT:
         return redirect(url_for('dashboard.parent_dashboard'))
     return redirect(url_for('main.index'))
 
@@ -39,29 +57,37 @@ def student_dashboard():
     Age-adaptive interface based on student's age group.
     """
     
-    if current_user.role.value != 'student':
+    if current_user.role != UserRole.STUDENT:
         flash('Access denied. This dashboard is for students only.', 'error')
         return redirect(url_for('main.index'))
     
-    # Get student's learning progress
-    recent_lessons = RevisionLog.query.filter_by(user_id=current_user.id)\
-        .order_by(RevisionLog.timestamp.desc()).limit(5).all()
+    # Get student's learning progress as lightweight rows
+    recent_lessons = db.session.query(
+        Lesson.id,
+        Lesson.title,
+        RevisionLog.score,
+        RevisionLog.timestamp
+    ).join(Lesson, RevisionLog.lesson_id == Lesson.id)\
+    .filter(RevisionLog.user_id == current_user.id)\
+    .order_by(RevisionLog.timestamp.desc()).limit(5).all()
     
-    # Get recommended lessons based on age group
-    recommended_lessons = Lesson.query.filter_by(
-        age_group_target=current_user.age_group,
-        is_published=True
-    ).order_by(Lesson.created_at.desc()).limit(6).all()
+    # Get recommended lessons based on age group (shared by every student in it)
+    recommended_lessons = get_recommended_lessons(current_user.age_group)
     
-    # Calculate learning statistics
-    total_lessons_completed = RevisionLog.query.filter_by(user_id=current_user.id).count()
-    total_flashcards_reviewed = EngagementMetric.query.filter_by(
-        user_id=current_user.id,
-        activity_type='flashcard_review'
-    ).count()
-    
-    # Get current streak (consecutive days with activity)
-    streak = calculate_learning_streak(current_user.id)
+    # Calculate learning statistics and the current streak (consecutive days
+    # with activity) in one round trip
+    lessons_completed_count = db.session.query(func.count(RevisionLog.id))\
+        .filter(RevisionLog.user_id == current_user.id).scalar_subquery()
+    flashcards_reviewed_count = db.session.query(func.count(EngagementMetric.id))\
+        .filter(
+            EngagementMetric.user_id == current_user.id,
+            EngagementMetric.activity_type == ActivityType.FLASHCARD_REVIEW
+        ).scalar_subquery()
+    total_lessons_completed, total_flashcards_reviewed, streak = db.session.query(
+        lessons_completed_count,
+        flashcards_reviewed_count,
+        learning_streak_query(current_user.id).scalar_subquery()
+    ).one()
     
     # Get performance by subject
     subject_performance = get_subject_performance(current_user.id)
@@ -86,8 +112,10 @@ def teacher_dashboard():
         flash('Access denied. This dashboard is for teachers only.', 'error')
         return redirect(url_for('main.index'))
     
-    # Get teacher's lessons
-    teacher_lessons = Lesson.query.filter_by(teacher_id=current_user.id)\
+    # Get teacher's lessons; dashboards read only the columns they show and never lazy-load
+    teacher_lessons = Lesson.query.options(*list_loading(
+        load_only(Lesson.id, Lesson.title, Lesson.subject, Lesson.is_published, Lesson.created_at)
+    )).filter_by(teacher_id=current_user.id)\
         .order_by(Lesson.created_at.desc()).limit(10).all()
     
     # Get lesson statistics
@@ -97,12 +125,14 @@ def teacher_dashboard():
         is_published=True
     ).count()
     
-    # Get total flashcards and questions created
-    total_flashcards = 0
-    total_questions = 0
-    for lesson in teacher_lessons:
-        total_flashcards += lesson.flashcards.count()
-        total_questions += lesson.questions.count()
+    # Get total flashcards and questions created across all lessons in one round trip
+    flashcard_total = db.session.query(func.count(Flashcard.id))\
+        .join(Lesson, Flashcard.lesson_id == Lesson.id)\
+        .filter(Lesson.teacher_id == current_user.id).scalar_subquery()
+    question_total = db.session.query(func.count(Question.id))\
+        .join(Lesson, Question.lesson_id == Lesson.id)\
+        .filter(Lesson.teacher_id == current_user.id).scalar_subquery()
+    total_flashcards, total_questions = db.session.query(flashcard_total, question_total).one()
     
     # Get student engagement metrics for teacher's lessons
     lesson_engagement = get_lesson_engagement_stats(current_user.id)
@@ -122,7 +152,7 @@ def parent_dashboard():
     Parent dashboard for monitoring child's learning progress.
     """
     
-    if current_user.role.value != 'parent':
+    if current_user.role != UserRole.PARENT:
         flash('Access denied. This dashboard is for parents only.', 'error')
         return redirect(url_for('main.index'))
     
@@ -149,27 +179,47 @@ def admin_dashboard():
     Admin dashboard with platform-wide analytics and management tools.
     """
     
-    if current_user.role.value != 'admin':
+    if current_user.role != UserRole.ADMIN:
         flash('Access denied. This dashboard is for administrators only.', 'error')
         return redirect(url_for('main.index'))
     
-    # Get platform statistics
-    total_users = User.query.count()
-    total_lessons = Lesson.query.count()
-    total_flashcards = Flashcard.query.count()
-    total_questions = Question.query.count()
+    # Get platform content totals in one round trip
+    total_lessons, total_flashcards, total_questions = db.session.query(
+        db.session.query(func.count(Lesson.id)).scalar_subquery(),
+        db.session.query(func.count(Flashcard.id)).scalar_subquery(),
+        db.session.query(func.count(Question.id)).scalar_subquery()
+    ).one()
     
-    # Get user statistics by role
+    # Get user statistics by role from a single grouped count
+    role_counts = dict(
+        db.session.query(User.role, func.count(User.id)).group_by(User.role).all()
+    )
+    total_users = sum(role_counts.values())
     user_stats = {
-        'students': User.query.filter_by(role='student').count(),
-        'teachers': User.query.filter_by(role='teacher').count(),
-        'parents': User.query.filter_by(role='parent').count(),
-        'admins': User.query.filter_by(role='admin').count()
+        'students': role_counts.get(UserRole.STUDENT, 0),
+        'teachers': role_counts.get(UserRole.TEACHER, 0),
+        'parents': role_counts.get(UserRole.PARENT, 0),
+        'admins': role_counts.get(UserRole.ADMIN, 0)
     }
     
-    # Get recent activity
-    recent_activity = EngagementMetric.query\
-        .order_by(EngagementMetric.timestamp.desc()).limit(20).all()
+    # Get recent activity, newest first; before_ts/before_id page further back by keyset
+    recent_activity_query = db.session.query(
+        EngagementMetric.id,
+        EngagementMetric.user_id,
+        EngagementMetric.activity_type,
+        EngagementMetric.timestamp
+    )
+    
+    before = parse_activity_cursor(request.args.get('before_ts'), request.args.get('before_id', type=int))
+    if before:
+        before_ts, before_id = before
+        recent_activity_query = recent_activity_query.filter(or_(
+            EngagementMetric.timestamp < before_ts,
+            and_(EngagementMetric.timestamp == before_ts, EngagementMetric.id < before_id)
+        ))
+    
+    recent_activity = recent_activity_query\
+        .order_by(EngagementMetric.timestamp.desc(), EngagementMetric.id.desc()).limit(20).all()
     
     # Get lesson statistics by age group
     age_group_stats = get_age_group_lesson_stats()
@@ -183,6 +233,19 @@ def admin_dashboard():
                          recent_activity=recent_activity,
                          age_group_stats=age_group_stats)
 
+def parse_activity_cursor(before_ts, before_id):
+    """
+    Parse the admin activity feed's keyset cursor, or return None if it is absent or malformed.
+    """
+    
+    if not before_ts or before_id is None:
+        return None
+    
+    try:
+        return datetime.fromisoformat(before_ts), before_id
+    except ValueError:
+        return None
+
 @dashboard_bp.route('/api/progress-chart')
 @login_required
 def api_progress_chart():
@@ -203,20 +266,20 @@ def api_progress_chart():
             EngagementMetric.user_id == current_user.id,
             EngagementMetric.timestamp >= start_date,
             EngagementMetric.timestamp <= end_date
-        ).group_by(func.date(EngagementMetric.timestamp)).all()
+        ).group_by(func.date(EngagementMetric.timestamp))\
+        .order_by(func.date(EngagementMetric.timestamp)).all()
         
-        # Format data for chart
-        chart_data = []
-        for activity in daily_activity:
-            chart_data.append({
-                'date': activity.date.isoformat(),
-                'count': activity.count
-            })
+        # Format data for chart; str() covers both date objects and SQLite's date strings
+        chart_data = [
+            {'date': str(activity.date), 'count': activity.count}
+            for activity in daily_activity
+        ]
         
-        return jsonify({
-            'success': True,
-            'data': chart_data
-        })
+        # Serialize with orjson straight into the response body
+        return current_app.response_class(
+            orjson.dumps({'success': True, 'data': chart_data}),
+            mimetype='application/json'
+        )
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -229,10 +292,15 @@ def api_performance_summary():
     """
     
     try:
-        # Get user's revision logs
-        revision_logs = RevisionLog.query.filter_by(user_id=current_user.id).all()
+        # Aggregate the user's revision logs in the database
+        total_attempts, scored_attempts, average_score, best_score = db.session.query(
+            func.count(RevisionLog.id),
+            func.count(RevisionLog.score),
+            func.avg(RevisionLog.score),
+            func.max(RevisionLog.score)
+        ).filter(RevisionLog.user_id == current_user.id).one()
         
-        if not revision_logs:
+        if not total_attempts:
             return jsonify({
                 'success': True,
                 'summary': {
@@ -243,40 +311,24 @@ def api_performance_summary():
                 }
             })
         
-        # Calculate performance metrics
-        total_attempts = len(revision_logs)
-        scores = [log.score for log in revision_logs if log.score is not None]
-        
-        if scores:
-            average_score = sum(scores) / len(scores)
-            best_score = max(scores)
+        # Calculate improvement trend from the newest scores against the oldest ones
+        trend = 'stable'
+        if scored_attempts >= 5:
+            older_count = 5 if scored_attempts >= 10 else scored_attempts // 2
+            recent_avg = get_average_score(current_user.id, RevisionLog.timestamp.desc(), 5)
+            older_avg = get_average_score(current_user.id, RevisionLog.timestamp.asc(), older_count)
             
-            # Calculate improvement trend
-            if len(scores) >= 5:
-                recent_scores = scores[-5:]
-                older_scores = scores[:5] if len(scores) >= 10 else scores[:len(scores)//2]
-                recent_avg = sum(recent_scores) / len(recent_scores)
-                older_avg = sum(older_scores) / len(older_scores)
-                
-                if recent_avg > older_avg + 5:
-                    trend = 'improving'
-                elif recent_avg < older_avg - 5:
-                    trend = 'declining'
-                else:
-                    trend = 'stable'
-            else:
-                trend = 'stable'
-        else:
-            average_score = 0
-            best_score = 0
-            trend = 'stable'
+            if recent_avg > older_avg + 5:
+                trend = 'improving'
+            elif recent_avg < older_avg - 5:
+                trend = 'declining'
         
         return jsonify({
             'success': True,
             'summary': {
                 'total_attempts': total_attempts,
-                'average_score': round(average_score, 1),
-                'best_score': round(best_score, 1),
+                'average_score': round(average_score or 0, 1),
+                'best_score': round(best_score or 0, 1),
                 'improvement_trend': trend
             }
         })
@@ -284,38 +336,90 @@ def api_performance_summary():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def get_average_score(user_id, order, limit):
+    """
+    Average of a user's first `limit` scored revision logs in the given order.
+    """
+    
+    scores = db.session.query(RevisionLog.score)\
+        .filter(RevisionLog.user_id == user_id, RevisionLog.score.isnot(None))\
+        .order_by(order).limit(limit).subquery()
+    
+    return db.session.query(func.avg(scores.c.score)).scalar() or 0
+
 def calculate_learning_streak(user_id):
     """
     Calculate consecutive days of learning activity.
     """
     
-    try:
-        # Get all activity dates for the user
-        activity_dates = db.session.query(
-            db.func.date(EngagementMetric.timestamp).label('date')
-        ).filter_by(user_id=user_id).distinct().order_by('date').all()
-        
-        if not activity_dates:
-            return 0
-        
-        # Convert to date objects
-        dates = [activity.date for activity in activity_dates]
-        
-        # Calculate streak
-        streak = 0
-        current_date = datetime.utcnow().date()
-        
-        for i in range(len(dates) - 1, -1, -1):
-            if dates[i] == current_date - timedelta(days=streak):
-                streak += 1
-            else:
-                break
-        
-        return streak
+    return learning_streak_query(user_id).scalar() or 0
+
+def learning_streak_query(user_id):
+    """
+    Build the query counting a user's consecutive activity days up to today.
+    Returned unexecuted so callers can embed it as a scalar subquery.
+    """
+    
+    # Number the user's distinct activity days from the most recent one
+    activity_days = db.session.query(
+        func.date(EngagementMetric.timestamp).label('day')
+    ).filter(EngagementMetric.user_id == user_id).distinct().subquery()
+    
+    ranked_days = db.session.query(
+        activity_days.c.day,
+        func.row_number().over(order_by=activity_days.c.day.desc()).label('position')
+    ).subquery()
+    
+    # A day belongs to the streak while it is exactly (position - 1) days before today;
+    # the first gap pushes every later day further back, so the matches are the streak
+    today = datetime.utcnow().date()
+    return db.session.query(func.count()).select_from(ranked_days).filter(
+        day_number(literal(today)) - day_number(ranked_days.c.day) == ranked_days.c.position - 1
+    )
+
+def day_number(date_expression):
+    """
+    Whole-day ordinal of a date expression, for day arithmetic on each supported database.
+    """
+    
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'mysql':
+        return func.to_days(date_expression)
+    if dialect == 'sqlite':
+        return func.julianday(date_expression)
+    return date_expression - literal(date(1970, 1, 1))
+
+def get_recommended_lessons(age_group):
+    """
+    Get the newest published lessons for an age group, cached across users.
+    """
+    
+    version = cache.get(RECOMMENDED_LESSONS_VERSION_KEY) or 0
+    cache_key = f'recommended_lessons:{age_group.value}:v{version}'
+    
+    recommended_lessons = cache.get(cache_key)
+    if recommended_lessons is None:
+        rows = db.session.query(
+            Lesson.id,
+            Lesson.title,
+            Lesson.subject,
+            Lesson.created_at
+        ).filter(
+            Lesson.age_group_target == age_group,
+            Lesson.is_published == True
+        ).order_by(Lesson.created_at.desc()).limit(6).all()
         
-    except Exception as e:
-        print(f"Error calculating learning streak: {e}")
-        return 0
+        recommended_lessons = [row._asdict() for row in rows]
+        cache.set(cache_key, recommended_lessons, timeout=RECOMMENDED_LESSONS_CACHE_TIMEOUT)
+    
+    return recommended_lessons
+
+@event.listens_for(Lesson, 'after_insert')
+@event.listens_for(Lesson, 'after_update')
+@event.listens_for(Lesson, 'after_delete')
+def invalidate_recommended_lessons(mapper, connection, target):
+    """Retire cached recommendations whenever a lesson is written."""
+    cache.set(RECOMMENDED_LESSONS_VERSION_KEY, datetime.utcnow().timestamp(), timeout=0)
 
 def get_subject_performance(user_id):
     """
@@ -342,8 +446,8 @@ def get_subject_performance(user_id):
         
         return subject_performance
         
-    except Exception as e:
-        print(f"Error getting subject performance: {e}")
+    except SQLAlchemyError:
+        logger.exception("Error getting subject performance")
         return []
 
 def get_lesson_engagement_stats(teacher_id):
@@ -352,41 +456,37 @@ def get_lesson_engagement_stats(teacher_id):
     """
     
     try:
-        # Get lessons created by teacher
-        teacher_lessons = Lesson.query.filter_by(teacher_id=teacher_id).all()
+        # Count tracked activities per lesson in a single grouped query.
+        # Match on the lesson_id key rather than the whole activity_data blob,
+        # which also carries additional_data.
+        engagement_counts = db.session.query(
+            Lesson.id,
+            Lesson.title,
+            EngagementMetric.activity_type,
+            func.count(EngagementMetric.id).label('count')
+        ).outerjoin(EngagementMetric, and_(
+            EngagementMetric.activity_type.in_(list(LESSON_ENGAGEMENT_FIELDS)),
+            EngagementMetric.activity_data['lesson_id'].as_integer() == Lesson.id
+        )).filter(Lesson.teacher_id == teacher_id)\
+        .group_by(Lesson.id, Lesson.title, EngagementMetric.activity_type)\
+        .order_by(Lesson.id).all()
         
-        engagement_stats = []
-        for lesson in teacher_lessons:
-            # Get total views
-            total_views = EngagementMetric.query.filter_by(
-                activity_type='lesson_view',
-                activity_data={'lesson_id': lesson.id}
-            ).count()
-            
-            # Get total flashcards reviewed
-            flashcard_reviews = EngagementMetric.query.filter_by(
-                activity_type='flashcard_review',
-                activity_data={'lesson_id': lesson.id}
-            ).count()
-            
-            # Get total quiz attempts
-            quiz_attempts = EngagementMetric.query.filter_by(
-                activity_type='quiz_attempt',
-                activity_data={'lesson_id': lesson.id}
-            ).count()
-            
-            engagement_stats.append({
-                'lesson_id': lesson.id,
-                'lesson_title': lesson.title,
-                'total_views': total_views,
-                'flashcard_reviews': flashcard_reviews,
-                'quiz_attempts': quiz_attempts
+        engagement_stats = {}
+        for data in engagement_counts:
+            lesson_stats = engagement_stats.setdefault(data.id, {
+                'lesson_id': data.id,
+                'lesson_title': data.title,
+                'total_views': 0,
+                'flashcard_reviews': 0,
+                'quiz_attempts': 0
             })
+            if data.activity_type is not None:
+                lesson_stats[LESSON_ENGAGEMENT_FIELDS[data.activity_type]] = data.count
         
-        return engagement_stats
+        return list(engagement_stats.values())
         
-    except Exception as e:
-        print(f"Error getting lesson engagement stats: {e}")
+    except SQLAlchemyError:
+        logger.exception("Error getting lesson engagement stats")
         return []
 
 def get_age_group_lesson_stats():
@@ -395,14 +495,33 @@ def get_age_group_lesson_stats():
     """
     
     try:
-        age_group_stats = db.session.query(
+        # Count each table per age group separately; joining flashcards and questions
+        # together would multiply the rows and inflate every count
+        lesson_counts = db.session.query(
+            Lesson.age_group_target,
+            func.count(Lesson.id).label('lesson_count')
+        ).group_by(Lesson.age_group_target).subquery()
+        
+        flashcard_counts = db.session.query(
+            Lesson.age_group_target,
+            func.count(Flashcard.id).label('flashcard_count')
+        ).join(Flashcard, Lesson.id == Flashcard.lesson_id)\
+        .group_by(Lesson.age_group_target).subquery()
+        
+        question_counts = db.session.query(
             Lesson.age_group_target,
-            func.count(Lesson.id).label('lesson_count'),
-            func.count(Flashcard.id).label('flashcard_count'),
             func.count(Question.id).label('question_count')
-        ).outerjoin(Flashcard, Lesson.id == Flashcard.lesson_id)\
-        .outerjoin(Question, Lesson.id == Question.lesson_id)\
-        .group_by(Lesson.age_group_target).all()
+        ).join(Question, Lesson.id == Question.lesson_id)\
+        .group_by(Lesson.age_group_target).subquery()
+        
+        age_group_stats = db.session.query(
+            lesson_counts.c.age_group_target,
+            lesson_counts.c.lesson_count,
+            func.coalesce(flashcard_counts.c.flashcard_count, 0).label('flashcard_count'),
+            func.coalesce(question_counts.c.question_count, 0).label('question_count')
+        ).outerjoin(flashcard_counts, lesson_counts.c.age_group_target == flashcard_counts.c.age_group_target)\
+        .outerjoin(question_counts, lesson_counts.c.age_group_target == question_counts.c.age_group_target)\
+        .all()
         
         stats = []
         for data in age_group_stats:
@@ -415,6 +534,6 @@ def get_age_group_lesson_stats():
         
         return stats
         
-    except Exception as e:
-        print(f"Error getting age group lesson stats: {e}")
+    except SQLAlchemyError:
+        logger.exception("Error getting age group lesson stats")
         return []
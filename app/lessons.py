@@ -10,19 +10,270 @@ This module handles:
 - Content organization and search
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app, Response, stream_with_context, abort
 from flask_login import login_required, current_user
-from database.models import Lesson, Flashcard, Question, RevisionLog, EngagementMetric, User, UserRole, AgeGroup, ContentFormat
-from app import db
-from sqlalchemy import or_
+from database.models import Lesson, Flashcard, Question, ExternalResource, RevisionLog, EngagementMetric, User, UserRole, AgeGroup, ContentFormat, ActivityType, bulk_insert
+from app import db, cache, cache_is_shared
+from app.background import BatchWriter
+from sqlalchemy import or_, and_, func, event, select, literal, literal_column
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import selectinload, aliased, raiseload, undefer
 from datetime import datetime
-import json
+import logging
+import orjson
+import re
+
+logger = logging.getLogger(__name__)
 
 lessons_bp = Blueprint('lessons', __name__, url_prefix='/lessons')
 
+# Characters with a special meaning in MySQL boolean full-text queries
+FULLTEXT_OPERATORS = re.compile(r'[+\-<>()~*"@]+')
+
+def fulltext_match(columns, search_query):
+    """
+    Build a MySQL MATCH over columns sharing a full-text index, matching every word as a prefix.
+    Returns None on other databases or when the query has no searchable words.
+    """
+    if db.session.get_bind().dialect.name == 'mysql':
+        terms = FULLTEXT_OPERATORS.sub(' ', search_query).split()
+        if terms:
+            return match(*columns, against=' '.join(f'+{term}*' for term in terms)).in_boolean_mode()
+    
+    return None
+
+def fulltext_filter(columns, search_query):
+    """
+    Build a text search predicate over columns sharing a full-text index.
+    Databases without full-text search fall back to substring LIKE matching.
+    """
+    fulltext = fulltext_match(columns, search_query)
+    if fulltext is not None:
+        return fulltext
+    
+    return or_(*[column.contains(search_query) for column in columns])
+
+def fulltext_relevance(columns, search_query):
+    """
+    Score how well columns sharing a full-text index match, for ranking results of different tables together.
+    Every row scores 0 where full-text search is unavailable.
+    """
+    fulltext = fulltext_match(columns, search_query)
+    return fulltext if fulltext is not None else literal(0)
+
+# Lesson columns covered by the lesson full-text index
+LESSON_SEARCH_COLUMNS = (Lesson.title, Lesson.topic, Lesson.description, Lesson.ai_summary)
+
+def lesson_search_filter(search_query):
+    """
+    Build the lesson search predicate: full-text over the lesson's text plus an exact tag match.
+    """
+    if db.session.get_bind().dialect.name == 'mysql':
+        # Written as tags->'$' so the multi-valued tags index applies
+        tag_match = func.json_contains(Lesson.tags.op('->')(literal_column("'$'")), func.json_quote(search_query))
+    else:
+        tag_match = Lesson.tags.contains([search_query])
+    
+    return or_(
+        fulltext_filter(LESSON_SEARCH_COLUMNS, search_query),
+        tag_match
+    )
+
+# Seconds the lessons index filter options are reused before being recomputed
+FILTER_FACETS_CACHE_TIMEOUT = 300
+
+@cache.memoize(timeout=FILTER_FACETS_CACHE_TIMEOUT)
+def get_lesson_filter_facets():
+    """Get the distinct subjects, age groups and difficulty levels for the index filters."""
+    return {
+        'subjects': [subject for (subject,) in db.session.query(Lesson.subject).distinct()],
+        'age_groups': [age_group.value for (age_group,) in db.session.query(Lesson.age_group_target).distinct()],
+        'difficulty_levels': [level for (level,) in db.session.query(Lesson.difficulty_level).distinct()]
+    }
+
+@event.listens_for(Lesson, 'after_insert')
+@event.listens_for(Lesson, 'after_update')
+@event.listens_for(Lesson, 'after_delete')
+def invalidate_lesson_filter_facets(mapper=None, connection=None, target=None):
+    """Drop the cached filter options whenever a lesson is written."""
+    cache.delete_memoized(get_lesson_filter_facets)
+
+# Seconds the platform statistics are kept in a shared cache; writes clear them sooner,
+# this only bounds drift from writes that bypass the ORM events
+STATS_CACHE_TIMEOUT = 3600
+
+# Seconds they are kept in a per-process cache, where a write only clears its own worker's copy
+LOCAL_STATS_CACHE_TIMEOUT = 60
+
+PLATFORM_STATS_CACHE_KEY = 'platform_stats'
+
+def get_platform_stats():
+    """Count the platform's content, shared across requests until it changes."""
+    stats = cache.get(PLATFORM_STATS_CACHE_KEY)
+    if stats is None:
+        stats = count_platform_stats()
+        timeout = STATS_CACHE_TIMEOUT if cache_is_shared() else LOCAL_STATS_CACHE_TIMEOUT
+        cache.set(PLATFORM_STATS_CACHE_KEY, stats, timeout=timeout)
+    return stats
+
+def count_platform_stats():
+    """Count lessons, flashcards, questions and resources."""
+    def count(model, *criteria):
+        return select(func.count(model.id)).where(*criteria).scalar_subquery()
+    
+    # Every counter is a scalar subquery of one SELECT, so the stats cost a single round trip
+    stats = db.session.execute(select(
+        count(Lesson).label('total_lessons'),
+        count(Flashcard).label('total_flashcards'),
+        count(Question).label('total_questions'),
+        count(ExternalResource).label('total_resources'),
+        count(Lesson, Lesson.is_published == True).label('published_lessons'),
+        (count(Flashcard, Flashcard.ai_generated == True) +
+         count(Question, Question.ai_generated == True)).label('ai_generated_content')
+    )).one()
+    
+    return dict(stats._mapping)
+
+@event.listens_for(Lesson, 'after_insert')
+@event.listens_for(Lesson, 'after_update')
+@event.listens_for(Lesson, 'after_delete')
+@event.listens_for(Flashcard, 'after_insert')
+@event.listens_for(Flashcard, 'after_update')
+@event.listens_for(Flashcard, 'after_delete')
+@event.listens_for(Question, 'after_insert')
+@event.listens_for(Question, 'after_update')
+@event.listens_for(Question, 'after_delete')
+@event.listens_for(ExternalResource, 'after_insert')
+@event.listens_for(ExternalResource, 'after_delete')
+def invalidate_platform_stats(mapper=None, connection=None, target=None):
+    """Drop the cached platform statistics whenever counted content is written."""
+    cache.delete(PLATFORM_STATS_CACHE_KEY)
+
+def list_loading(*options):
+    """
+    Loader options for a list query. In debug, any relationship the options leave out
+    raises on access instead of quietly lazy-loading once per row.
+    """
+    if current_app.debug:
+        return (*options, raiseload('*'))
+    
+    return options
+
+def viewable_lesson_criteria(lesson_id):
+    """Criteria matching the lesson if it is published or belongs to the current user."""
+    viewer_id = current_user.id if current_user.is_authenticated else None
+    return Lesson.id == lesson_id, or_(Lesson.is_published == True, Lesson.teacher_id == viewer_id)
+
+def get_viewable_lesson(lesson_id, *options):
+    """
+    Load a lesson the current user may see, or abort with 404.
+    Unpublished lessons are only visible to their teacher.
+    """
+    return Lesson.query.options(*options).filter(*viewable_lesson_criteria(lesson_id)).first_or_404()
+
+def require_viewable_lesson(lesson_id):
+    """Abort with 404 unless the current user may see the lesson, without loading its row."""
+    if db.session.query(Lesson.id).filter(*viewable_lesson_criteria(lesson_id)).first() is None:
+        abort(404)
+
+# Seconds a lesson's serialized flashcards/questions are reused, and clients may keep them
+LESSON_CONTENT_CACHE_TIMEOUT = 300
+
+def lesson_content_cache_key(kind, lesson_id):
+    """Cache key for a lesson's serialized flashcards or questions at their current version."""
+    version = cache.get(f'lesson_content:{lesson_id}:version') or 0
+    return f'lesson_content:{lesson_id}:{kind}:v{version}'
+
+def lesson_content_response(body):
+    """Wrap a serialized lesson content body in a response clients can revalidate by ETag."""
+    response = current_app.response_class(body, mimetype='application/json')
+    response.add_etag()
+    response.cache_control.max_age = LESSON_CONTENT_CACHE_TIMEOUT
+    # Unpublished lessons are served to their teacher, so shared caches must not keep a copy
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
+@event.listens_for(Flashcard, 'after_insert')
+@event.listens_for(Flashcard, 'after_update')
+@event.listens_for(Flashcard, 'after_delete')
+@event.listens_for(Question, 'after_insert')
+@event.listens_for(Question, 'after_update')
+@event.listens_for(Question, 'after_delete')
+def invalidate_lesson_content(mapper, connection, target):
+    """Retire a lesson's cached flashcards and questions whenever one of them is written."""
+    if target.lesson_id is not None:
+        cache.set(f'lesson_content:{target.lesson_id}:version', datetime.utcnow().timestamp(), timeout=0)
+
+# Sample flashcards seeded for each subject, with a writing-themed fallback
+SAMPLE_FLASHCARDS = {
+    'mathematics': [
+        {'term': 'Variable', 'definition': 'A symbol (usually a letter) that represents a number that can change.'},
+        {'term': 'Equation', 'definition': 'A mathematical statement that shows two expressions are equal.'},
+        {'term': 'Expression', 'definition': 'A combination of numbers, variables, and operations.'}
+    ],
+    'science': [
+        {'term': 'Atom', 'definition': 'The smallest unit of an element that retains its properties.'},
+        {'term': 'Molecule', 'definition': 'A group of atoms bonded together.'},
+        {'term': 'Chemical Reaction', 'definition': 'A process that changes substances into new ones.'}
+    ],
+    'history': [
+        {'term': 'Civilization', 'definition': 'A complex society with cities, government, and culture.'},
+        {'term': 'Empire', 'definition': 'A group of nations or peoples ruled by a single authority.'},
+        {'term': 'Archaeology', 'definition': 'The study of ancient cultures through artifacts and remains.'}
+    ]
+}
+DEFAULT_SAMPLE_FLASHCARDS = [
+    {'term': 'Plot', 'definition': 'The sequence of events that make up a story.'},
+    {'term': 'Character', 'definition': 'A person, animal, or being in a story.'},
+    {'term': 'Setting', 'definition': 'The time and place where a story takes place.'}
+]
+
+# Sample questions seeded for each subject, with a writing-themed fallback
+SAMPLE_QUESTIONS = {
+    'mathematics': [
+        {
+            'question_text': 'What is the value of x in the equation 2x + 5 = 13?',
+            'answer_text': 'x = 4',
+            'question_type': 'multiple_choice'
+        },
+        {
+            'question_text': 'Simplify the expression 3x + 2x - x',
+            'answer_text': '4x',
+            'question_type': 'multiple_choice'
+        }
+    ],
+    'science': [
+        {
+            'question_text': 'What is the chemical symbol for gold?',
+            'answer_text': 'Au',
+            'question_type': 'multiple_choice'
+        },
+        {
+            'question_text': 'How many protons does a hydrogen atom have?',
+            'answer_text': '1',
+            'question_type': 'multiple_choice'
+        }
+    ]
+}
+DEFAULT_SAMPLE_QUESTIONS = [
+    {
+        'question_text': 'What is the main purpose of creative writing?',
+        'answer_text': 'To express imagination and creativity through words',
+        'question_type': 'essay'
+    }
+]
+
+# Set once this process has confirmed the lessons table is seeded
+_SAMPLES_CHECKED = False
+
 def create_sample_lessons():
     """Create sample lessons if none exist in the database."""
-    if Lesson.query.count() > 0:
+    global _SAMPLES_CHECKED
+    if _SAMPLES_CHECKED:
+        return
+    
+    if db.session.query(Lesson.id).first() is not None:
+        _SAMPLES_CHECKED = True
         return  # Already have lessons
     
     # Create a sample teacher user if none exists
@@ -84,106 +335,38 @@ def create_sample_lessons():
         }
     ]
     
+    # Insert all lessons in one batch, then read back their ids
+    db.session.bulk_insert_mappings(Lesson, [
+        dict(lesson_data, format_type=ContentFormat.TEXT, teacher_id=teacher.id, is_published=True)
+        for lesson_data in sample_lessons
+    ])
+    lesson_ids = dict(Lesson.query.with_entities(Lesson.title, Lesson.id).filter(
+        Lesson.title.in_([lesson_data['title'] for lesson_data in sample_lessons])
+    ).all())
+    
+    flashcard_rows = []
+    question_rows = []
+    
     for lesson_data in sample_lessons:
-        lesson = Lesson(
-            title=lesson_data['title'],
-            description=lesson_data['description'],
-            topic=lesson_data['topic'],
-            subject=lesson_data['subject'],
-            age_group_target=lesson_data['age_group_target'],
-            difficulty_level=lesson_data['difficulty_level'],
-            ai_summary=lesson_data.get('ai_summary'),
-            format_type=ContentFormat.TEXT,
-            tags=lesson_data['tags'],
-            teacher_id=teacher.id,
-            is_published=True
-        )
-        db.session.add(lesson)
-        db.session.flush()
-        
-        # Create sample flashcards for each lesson
-        if lesson.subject == 'mathematics':
-            sample_flashcards = [
-                {'term': 'Variable', 'definition': 'A symbol (usually a letter) that represents a number that can change.'},
-                {'term': 'Equation', 'definition': 'A mathematical statement that shows two expressions are equal.'},
-                {'term': 'Expression', 'definition': 'A combination of numbers, variables, and operations.'}
-            ]
-        elif lesson.subject == 'science':
-            sample_flashcards = [
-                {'term': 'Atom', 'definition': 'The smallest unit of an element that retains its properties.'},
-                {'term': 'Molecule', 'definition': 'A group of atoms bonded together.'},
-                {'term': 'Chemical Reaction', 'definition': 'A process that changes substances into new ones.'}
-            ]
-        elif lesson.subject == 'history':
-            sample_flashcards = [
-                {'term': 'Civilization', 'definition': 'A complex society with cities, government, and culture.'},
-                {'term': 'Empire', 'definition': 'A group of nations or peoples ruled by a single authority.'},
-                {'term': 'Archaeology', 'definition': 'The study of ancient cultures through artifacts and remains.'}
-            ]
-        else:
-            sample_flashcards = [
-                {'term': 'Plot', 'definition': 'The sequence of events that make up a story.'},
-                {'term': 'Character', 'definition': 'A person, animal, or being in a story.'},
-                {'term': 'Setting', 'definition': 'The time and place where a story takes place.'}
-            ]
+        lesson_id = lesson_ids[lesson_data['title']]
+        subject = lesson_data['subject']
         
-        for flashcard_data in sample_flashcards:
-            flashcard = Flashcard(
-                term=flashcard_data['term'],
-                definition=flashcard_data['definition'],
-                lesson_id=lesson.id,
-                ai_generated=False
-            )
-            db.session.add(flashcard)
+        # Create sample flashcards and questions for each lesson
+        for flashcard_data in SAMPLE_FLASHCARDS.get(subject, DEFAULT_SAMPLE_FLASHCARDS):
+            flashcard_rows.append(dict(flashcard_data, lesson_id=lesson_id, ai_generated=False))
         
-        # Create sample questions for each lesson
-        if lesson.subject == 'mathematics':
-            sample_questions = [
-                {
-                    'question_text': 'What is the value of x in the equation 2x + 5 = 13?',
-                    'answer_text': 'x = 4',
-                    'question_type': 'multiple_choice'
-                },
-                {
-                    'question_text': 'Simplify the expression 3x + 2x - x',
-                    'answer_text': '4x',
-                    'question_type': 'multiple_choice'
-                }
-            ]
-        elif lesson.subject == 'science':
-            sample_questions = [
-                {
-                    'question_text': 'What is the chemical symbol for gold?',
-                    'answer_text': 'Au',
-                    'question_type': 'multiple_choice'
-                },
-                {
-                    'question_text': 'How many protons does a hydrogen atom have?',
-                    'answer_text': '1',
-                    'question_type': 'multiple_choice'
-                }
-            ]
-        else:
-            sample_questions = [
-                {
-                    'question_text': 'What is the main purpose of creative writing?',
-                    'answer_text': 'To express imagination and creativity through words',
-                    'question_type': 'essay'
-                }
-            ]
-        
-        for question_data in sample_questions:
-            question = Question(
-                question_text=question_data['question_text'],
-                answer_text=question_data['answer_text'],
-                question_type=question_data['question_type'],
-                lesson_id=lesson.id,
-                ai_generated=False
-            )
-            db.session.add(question)
+        for question_data in SAMPLE_QUESTIONS.get(subject, DEFAULT_SAMPLE_QUESTIONS):
+            question_rows.append(dict(question_data, lesson_id=lesson_id, ai_generated=False))
+    
+    db.session.bulk_insert_mappings(Flashcard, flashcard_rows)
+    db.session.bulk_insert_mappings(Question, question_rows)
     
     try:
         db.session.commit()
+        _SAMPLES_CHECKED = True
+        # Bulk inserts skip the mapper events, so clear the filter options and statistics here
+        invalidate_lesson_filter_facets()
+        invalidate_platform_stats()
         print("Sample lessons created successfully!")
     except Exception as e:
         db.session.rollback()
@@ -206,7 +389,7 @@ def index():
     search_query = request.args.get('q', '').strip()
     
     # Build query
-    query = Lesson.query.filter_by(is_published=True)
+    query = Lesson.query.options(*list_loading()).filter_by(is_published=True)
     
     if subject != 'all':
         query = query.filter(Lesson.subject == subject)
@@ -221,32 +404,23 @@ def index():
         query = query.filter(Lesson.difficulty_level == difficulty)
     
     if search_query:
-        query = query.filter(
-            or_(
-                Lesson.title.contains(search_query),
-                Lesson.description.contains(search_query),
-                Lesson.topic.contains(search_query),
-                Lesson.tags.contains([search_query])
-            )
-        )
+        query = query.filter(lesson_search_filter(search_query))
     
-    # Get lessons with pagination
+    # Get lessons with pagination; the index page never shows a total, so skip the COUNT(*)
     page = request.args.get('page', 1, type=int)
     per_page = 12
     lessons = query.order_by(Lesson.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+        page=page, per_page=per_page, error_out=False, count=False
     )
     
     # Get available filters
-    subjects = db.session.query(Lesson.subject).distinct().all()
-    age_groups = db.session.query(Lesson.age_group_target).distinct().all()
-    difficulty_levels = db.session.query(Lesson.difficulty_level).distinct().all()
+    facets = get_lesson_filter_facets()
     
     return render_template('lessons/index.html',
                          lessons=lessons,
-                         subjects=[s[0] for s in subjects],
-                         age_groups=[ag[0].value for ag in age_groups],
-                         difficulty_levels=[dl[0] for dl in difficulty_levels],
+                         subjects=facets['subjects'],
+                         age_groups=facets['age_groups'],
+                         difficulty_levels=facets['difficulty_levels'],
                          current_filters={
                              'subject': subject,
                              'age_group': age_group,
@@ -279,16 +453,12 @@ def view(lesson_id):
     Shows lesson content, flashcards, and questions.
     """
     
-    lesson = Lesson.query.get_or_404(lesson_id)
-    
-    if not lesson.is_published and (not current_user.is_authenticated or 
-                                   current_user.id != lesson.teacher_id):
-        flash('This lesson is not available.', 'error')
-        return redirect(url_for('lessons.index'))
+    # key_points stays deferred: lessons/view.html never shows it, only download and the API do
+    lesson = get_viewable_lesson(lesson_id, selectinload(Lesson.flashcards), selectinload(Lesson.questions))
     
     # Get lesson content
-    flashcards = lesson.flashcards.all()
-    questions = lesson.questions.all()
+    flashcards = lesson.flashcards
+    questions = lesson.questions
     
     # Track engagement if user is logged in
     if current_user.is_authenticated:
@@ -312,7 +482,7 @@ def edit(lesson_id):
     
     lesson = Lesson.query.get_or_404(lesson_id)
     
-    if current_user.id != lesson.teacher_id and not current_user.role.value == 'admin':
+    if current_user.id != lesson.teacher_id and current_user.role != UserRole.ADMIN:
         flash('You can only edit your own lessons.', 'error')
         return redirect(url_for('lessons.view', lesson_id=lesson_id))
     
@@ -325,14 +495,9 @@ def flashcards(lesson_id):
     Supports interactive learning and progress tracking.
     """
     
-    lesson = Lesson.query.get_or_404(lesson_id)
+    lesson = get_viewable_lesson(lesson_id, selectinload(Lesson.flashcards))
     
-    if not lesson.is_published and (not current_user.is_authenticated or 
-                                   current_user.id != lesson.teacher_id):
-        flash('This lesson is not available.', 'error')
-        return redirect(url_for('lessons.index'))
-    
-    flashcards = lesson.flashcards.all()
+    flashcards = lesson.flashcards
     
     # Track engagement if user is logged in
     if current_user.is_authenticated:
@@ -349,14 +514,9 @@ def questions(lesson_id):
     Supports different question types and difficulty levels.
     """
     
-    lesson = Lesson.query.get_or_404(lesson_id)
+    lesson = get_viewable_lesson(lesson_id, selectinload(Lesson.questions))
     
-    if not lesson.is_published and (not current_user.is_authenticated or 
-                                   current_user.id != lesson.teacher_id):
-        flash('This lesson is not available.', 'error')
-        return redirect(url_for('lessons.index'))
-    
-    questions = lesson.questions.all()
+    questions = lesson.questions
     
     # Track engagement if user is logged in
     if current_user.is_authenticated:
@@ -373,14 +533,9 @@ def quiz(lesson_id):
     Supports multiple question types and scoring.
     """
     
-    lesson = Lesson.query.get_or_404(lesson_id)
+    lesson = get_viewable_lesson(lesson_id, selectinload(Lesson.questions))
     
-    if not lesson.is_published and (not current_user.is_authenticated or 
-                                   current_user.id != lesson.teacher_id):
-        flash('This lesson is not available.', 'error')
-        return redirect(url_for('lessons.index'))
-    
-    questions = lesson.questions.all()
+    questions = lesson.questions
     
     return render_template('lessons/quiz.html',
                          lesson=lesson,
@@ -401,9 +556,18 @@ def submit_quiz(lesson_id):
         total_questions = len(answers)
         correct_answers = 0
         
+        # Fetch every answered question's answer of this lesson in one query; both sides are normalized
+        # in Python, since SQL TRIM strips only spaces and would leave tabs and newlines
+        question_ids = [int(question_id) for question_id in answers if str(question_id).isdigit()]
+        correct_map = {
+            question_id: answer_text.lower().strip()
+            for question_id, answer_text in Question.query.with_entities(Question.id, Question.answer_text)
+            .filter(Question.lesson_id == lesson_id, Question.id.in_(question_ids))
+        }
+        
         for question_id, answer in answers.items():
-            question = Question.query.get(question_id)
-            if question and question.answer_text.lower().strip() == answer.lower().strip():
+            expected = correct_map.get(int(question_id)) if str(question_id).isdigit() else None
+            if expected is not None and expected == (answer or '').lower().strip():
                 correct_answers += 1
         
         score = (correct_answers / total_questions) * 100 if total_questions > 0 else 0
@@ -433,7 +597,7 @@ def submit_quiz(lesson_id):
             'total_questions': total_questions,
             'message': f'Quiz completed! Score: {score:.1f}%'
         })
-        
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -445,18 +609,17 @@ def download(lesson_id):
     Supports multiple formats and content packaging.
     """
     
-    lesson = Lesson.query.get_or_404(lesson_id)
-    
-    if not lesson.is_published and current_user.id != lesson.teacher_id:
-        flash('This lesson is not available for download.', 'error')
-        return redirect(url_for('lessons.view', lesson_id=lesson_id))
+    lesson = get_viewable_lesson(
+        lesson_id, undefer(Lesson.key_points), selectinload(Lesson.flashcards), selectinload(Lesson.questions)
+    )
     
     # Track download engagement
     track_engagement(current_user.id, 'download', lesson_id)
     
     # For now, return a simple text download
     # In production, implement proper content packaging
-    content = f"""
+    def generate_lesson_text():
+        yield f"""
 EduMorph Lesson: {lesson.title}
 Topic: {lesson.topic}
 Subject: {lesson.subject}
@@ -467,30 +630,28 @@ Summary:
 
 Key Points:
 """
-    
-    for point in lesson.key_points or []:
-        content += f"\n{point['id']}. {point['point']}"
-    
-    content += f"""
+        
+        for point in lesson.key_points or []:
+            yield f"\n{point['id']}. {point['point']}"
+        
+        yield """
 
 Flashcards:
 """
-    
-    for flashcard in lesson.flashcards:
-        content += f"\nQ: {flashcard.term}\nA: {flashcard.definition}\n"
-    
-    content += f"""
+        
+        for flashcard in lesson.flashcards:
+            yield f"\nQ: {flashcard.term}\nA: {flashcard.definition}\n"
+        
+        yield """
 
 Practice Questions:
 """
+        
+        for question in lesson.questions:
+            yield f"\nQ: {question.question_text}\nA: {question.answer_text}\n"
     
-    for question in lesson.questions:
-        content += f"\nQ: {question.question_text}\nA: {question.answer_text}\n"
-    
-    # Return as downloadable text file
-    from flask import make_response
-    response = make_response(content)
-    response.headers['Content-Type'] = 'text/plain'
+    # Stream the text file as it is generated
+    response = Response(stream_with_context(generate_lesson_text()), mimetype='text/plain')
     response.headers['Content-Disposition'] = f'attachment; filename="{lesson.title}.txt"'
     
     return response
@@ -503,13 +664,17 @@ def api_progress(lesson_id):
     """
     
     try:
-        # Get user's progress for this lesson
-        revision_logs = RevisionLog.query.filter_by(
-            user_id=current_user.id,
-            lesson_id=lesson_id
-        ).order_by(RevisionLog.timestamp.desc()).all()
+        # Aggregate the user's attempts at this lesson in SQL
+        total_attempts, best_score, average_score = db.session.query(
+            func.count(RevisionLog.id),
+            func.max(RevisionLog.score),
+            func.avg(RevisionLog.score)
+        ).filter(
+            RevisionLog.user_id == current_user.id,
+            RevisionLog.lesson_id == lesson_id
+        ).one()
         
-        if not revision_logs:
+        if not total_attempts:
             return jsonify({
                 'success': True,
                 'progress': {
@@ -520,23 +685,24 @@ def api_progress(lesson_id):
                 }
             })
         
-        latest_log = revision_logs[0]
-        total_attempts = len(revision_logs)
+        latest_log = RevisionLog.query.with_entities(RevisionLog.score, RevisionLog.timestamp)\
+            .filter_by(user_id=current_user.id, lesson_id=lesson_id)\
+            .order_by(RevisionLog.timestamp.desc()).first()
         
         progress = {
             'completed': latest_log.score >= 70,  # 70% threshold for completion
             'score': latest_log.score,
             'attempts': total_attempts,
             'last_attempt': latest_log.timestamp.isoformat(),
-            'best_score': max(log.score for log in revision_logs),
-            'average_score': sum(log.score for log in revision_logs) / total_attempts
+            'best_score': best_score,
+            'average_score': float(average_score)
         }
         
         return jsonify({
             'success': True,
             'progress': progress
         })
-        
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -546,26 +712,36 @@ def api_flashcards(lesson_id):
     API endpoint for lesson flashcards.
     """
     
+    # Checked on every request, since the cached body is shared by everyone who may see the lesson
+    require_viewable_lesson(lesson_id)
+    
     try:
-        lesson = Lesson.query.get_or_404(lesson_id)
-        flashcards = lesson.flashcards.all()
+        cache_key = lesson_content_cache_key('flashcards', lesson_id)
+        body = cache.get(cache_key)
         
-        flashcard_data = []
-        for flashcard in flashcards:
-            flashcard_data.append({
+        if body is None:
+            # Select only the serialized columns instead of hydrating Flashcard objects
+            flashcards = Flashcard.query.with_entities(
+                Flashcard.id, Flashcard.term, Flashcard.definition, Flashcard.context, Flashcard.example
+            ).filter(Flashcard.lesson_id == lesson_id).all()
+            
+            flashcard_data = [{
                 'id': flashcard.id,
                 'term': flashcard.term,
                 'definition': flashcard.definition,
                 'context': flashcard.context,
                 'example': flashcard.example
+            } for flashcard in flashcards]
+            
+            body = orjson.dumps({
+                'success': True,
+                'flashcards': flashcard_data,
+                'total': len(flashcard_data)
             })
+            cache.set(cache_key, body, timeout=LESSON_CONTENT_CACHE_TIMEOUT)
         
-        return jsonify({
-            'success': True,
-            'flashcards': flashcard_data,
-            'total': len(flashcard_data)
-        })
-        
+        return lesson_content_response(body)
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -575,50 +751,86 @@ def api_questions(lesson_id):
     API endpoint for lesson questions.
     """
     
+    # Checked on every request, since the cached body is shared by everyone who may see the lesson
+    require_viewable_lesson(lesson_id)
+    
     try:
-        lesson = Lesson.query.get_or_404(lesson_id)
-        questions = lesson.questions.all()
+        cache_key = lesson_content_cache_key('questions', lesson_id)
+        body = cache.get(cache_key)
         
-        question_data = []
-        for question in questions:
-            question_data.append({
+        if body is None:
+            # Select only the serialized columns instead of hydrating Question objects
+            questions = Question.query.with_entities(
+                Question.id, Question.question_text, Question.answer_text, Question.question_type, Question.difficulty_level
+            ).filter(Question.lesson_id == lesson_id).all()
+            
+            question_data = [{
                 'id': question.id,
                 'question': question.question_text,
                 'answer': question.answer_text,
                 'type': question.question_type,
                 'difficulty': question.difficulty_level
+            } for question in questions]
+            
+            body = orjson.dumps({
+                'success': True,
+                'questions': question_data,
+                'total': len(question_data)
             })
+            cache.set(cache_key, body, timeout=LESSON_CONTENT_CACHE_TIMEOUT)
         
-        return jsonify({
-            'success': True,
-            'questions': question_data,
-            'total': len(question_data)
-        })
-        
+        return lesson_content_response(body)
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def related_to_recent_studies(user_id):
+    """
+    Filter for lessons sharing a subject or topic with the user's ten most recently
+    revised lessons, excluding those lessons themselves, as a single SQL predicate.
+    """
+    recent_lesson_ids = db.session.query(RevisionLog.lesson_id)\
+        .filter(RevisionLog.user_id == user_id)\
+        .order_by(RevisionLog.timestamp.desc())\
+        .limit(10).subquery()
+    studied = aliased(Lesson)
+    
+    return and_(
+        or_(
+            Lesson.subject.in_(select(studied.subject).join(recent_lesson_ids, studied.id == recent_lesson_ids.c.lesson_id)),
+            Lesson.topic.in_(select(studied.topic).join(recent_lesson_ids, studied.id == recent_lesson_ids.c.lesson_id))
+        ),
+        Lesson.id.notin_(select(recent_lesson_ids.c.lesson_id))
+    )
+
+def record_engagements(engagements):
+    """Save every engagement event tracked since the previous flush in one bulk insert."""
+    bulk_insert(EngagementMetric, engagements)
+    db.session.commit()
+
+# Keeps engagement writes off the request path of the lesson pages,
+# flushing every second or as soon as 200 events are waiting
+engagement_writer = BatchWriter('engagement-writer', record_engagements, interval=1.0, max_batch=200)
+
 def track_engagement(user_id, activity_type, lesson_id, additional_data=None):
     """
     Track user engagement with lessons.
+    The event is queued and written in the background.
     """
     
     try:
-        engagement = EngagementMetric(
-            user_id=user_id,
-            activity_type=activity_type,
-            activity_data={
+        engagement_writer.add({
+            'user_id': user_id,
+            'activity_type': ActivityType(activity_type),
+            'activity_data': {
                 'lesson_id': lesson_id,
                 'additional_data': additional_data or {}
-            }
-        )
-        
-        db.session.add(engagement)
-        db.session.commit()
-        
-    except Exception as e:
-        print(f"Error tracking engagement: {e}")
-        db.session.rollback()
+            },
+            'timestamp': datetime.utcnow()
+        })
+    
+    except Exception:
+        logger.exception("Error tracking engagement")
 
 @lessons_bp.route('/api/recommendations')
 @login_required
@@ -628,29 +840,13 @@ def api_recommendations():
     """
     
     try:
-        # Get user's learning history
-        user_revision_logs = RevisionLog.query.filter_by(
-            user_id=current_user.id
-        ).order_by(RevisionLog.timestamp.desc()).limit(10).all()
-        
-        # Get subjects and topics the user has studied
-        studied_subjects = set()
-        studied_topics = set()
-        
-        for log in user_revision_logs:
-            lesson = Lesson.query.get(log.lesson_id)
-            if lesson:
-                studied_subjects.add(lesson.subject)
-                studied_topics.add(lesson.topic)
-        
         # Find related lessons
-        related_lessons = Lesson.query.filter(
+        related_lessons = Lesson.query.with_entities(
+            Lesson.id, Lesson.title, Lesson.topic, Lesson.subject, Lesson.difficulty_level, Lesson.estimated_duration
+        ).filter(
             Lesson.is_published == True,
-            or_(
-                Lesson.subject.in_(list(studied_subjects)),
-                Lesson.topic.in_(list(studied_topics))
-            )
-        ).filter(Lesson.id.notin_([log.lesson_id for log in user_revision_logs])).limit(6).all()
+            related_to_recent_studies(current_user.id)
+        ).limit(6).all()
         
         # Format recommendations
         recommendations = []
@@ -670,6 +866,6 @@ def api_recommendations():
             'recommendations': recommendations,
             'total': len(recommendations)
         })
-        
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -9,15 +9,31 @@ This module handles:
 - Age-adaptive content delivery
 """
 
-from flask import Blueprint, render_template, request, jsonify, current_app
+from flask import Blueprint, render_template, request, jsonify, current_app, redirect, url_for
 from flask_login import login_required, current_user
-from database.models import Lesson, Flashcard, Question, ExternalResource, SearchIndex
-from sqlalchemy import or_
+from database.models import User, Lesson, Flashcard, Question, SearchTerm, AgeGroup
+from sqlalchemy import or_, and_, func, select, union_all, literal, desc
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import aliased, load_only, selectinload
 from app import db
-import json
+from app.lessons import fulltext_filter, fulltext_relevance, lesson_search_filter, LESSON_SEARCH_COLUMNS, get_lesson_filter_facets, get_platform_stats, list_loading
+from datetime import datetime
 
 main_bp = Blueprint('main', __name__)
 
+# Most results a search page shows across all content types
+SEARCH_RESULT_LIMIT = 50
+
+# Longest MySQL may run the search and autocomplete queries before giving up, in milliseconds
+SEARCH_TIMEOUT_MS = 500
+AUTOCOMPLETE_TIMEOUT_MS = 100
+
+# MySQL error raised when a query exceeds its MAX_EXECUTION_TIME
+QUERY_TIMEOUT_ERROR = 3024
+
+# Lessons shown per page of the browse page
+BROWSE_PAGE_SIZE = 50
+
 @main_bp.route('/')
 def index():
     """
@@ -30,13 +46,19 @@ def index():
     if current_user.is_authenticated:
         age_group = current_user.age_group.value
     
-    # Get featured lessons for different age groups
-    featured_lessons = {
-        'children': Lesson.query.filter_by(age_group_target='children', is_published=True).limit(6).all(),
-        'teens': Lesson.query.filter_by(age_group_target='teens', is_published=True).limit(6).all(),
-        'young_adults': Lesson.query.filter_by(age_group_target='young_adults', is_published=True).limit(6).all(),
-        'adults': Lesson.query.filter_by(age_group_target='adults', is_published=True).limit(6).all()
-    }
+    # Get the six newest featured lessons of every age group in one ranked query
+    ranked = select(
+        Lesson,
+        func.row_number().over(
+            partition_by=Lesson.age_group_target,
+            order_by=(Lesson.created_at.desc(), Lesson.id.desc())
+        ).label('rank')
+    ).where(Lesson.is_published == True).subquery()
+    featured = aliased(Lesson, ranked)
+    
+    featured_lessons = {group.value: [] for group in AgeGroup}
+    for lesson in db.session.query(featured).filter(ranked.c.rank <= 6).order_by(ranked.c.rank):
+        featured_lessons[lesson.age_group_target.value].append(lesson)
     
     return render_template('main/index.html', 
                          featured_lessons=featured_lessons,
@@ -55,59 +77,111 @@ def search():
     subject = request.args.get('subject', 'all')
     
     if not query:
-        return render_template('main/search.html', results=[], query='', total=0)
-    
-    # For now, return sample results since SearchIndex model might not exist
-    # In a real implementation, you would query the database
-    sample_results = [
-        {
-            'type': 'lesson',
-            'id': 1,
-            'title': 'Introduction to Algebra',
-            'description': 'Learn the fundamentals of algebraic expressions and equations through interactive examples.',
-            'topic': 'Algebra',
-            'subject': 'mathematics',
-            'age_group': 'teens',
-            'url': '/lessons/1'
-        },
-        {
-            'type': 'flashcard',
-            'id': 1,
-            'term': 'Variable',
-            'definition': 'A symbol (usually a letter) that represents a number that can change.',
-            'lesson_id': 1,
-            'url': '/flashcards/1'
-        },
-        {
-            'type': 'question',
-            'id': 1,
-            'question': 'What is the value of x in the equation 2x + 5 = 13?',
-            'lesson_id': 1,
-            'url': '/questions/1'
-        }
-    ]
-    
-    # Filter results based on parameters
+        return render_template('main/search.html', results=[], query='', total=0, has_more=False)
+    
+    # Only content from published lessons is searchable, filtered by the lesson's subject and age group
+    lesson_filters = [Lesson.is_published == True]
+    
+    if subject != 'all':
+        lesson_filters.append(Lesson.subject == subject)
+    
+    if age_group != 'all':
+        try:
+            lesson_filters.append(Lesson.age_group_target == AgeGroup(age_group))
+        except ValueError:
+            pass
+    
+    searches = []
+    
+    if content_type in ('all', 'lesson'):
+        searches.append(
+            select(literal('lesson').label('type'), Lesson.id.label('id'), Lesson.id.label('lesson_id'),
+                   Lesson.title.label('title'), Lesson.description.label('body'),
+                   Lesson.topic, Lesson.subject, Lesson.age_group_target,
+                   fulltext_relevance(LESSON_SEARCH_COLUMNS, query).label('score'))
+            .where(lesson_search_filter(query), *lesson_filters)
+        )
+    
+    if content_type in ('all', 'flashcard'):
+        searches.append(
+            select(literal('flashcard').label('type'), Flashcard.id.label('id'), Flashcard.lesson_id.label('lesson_id'),
+                   Flashcard.term.label('title'), Flashcard.definition.label('body'),
+                   Lesson.topic, Lesson.subject, Lesson.age_group_target,
+                   fulltext_relevance((Flashcard.term, Flashcard.definition), query).label('score'))
+            .join(Lesson, Flashcard.lesson_id == Lesson.id)
+            .where(fulltext_filter((Flashcard.term, Flashcard.definition), query), *lesson_filters)
+        )
+    
+    if content_type in ('all', 'question'):
+        searches.append(
+            select(literal('question').label('type'), Question.id.label('id'), Question.lesson_id.label('lesson_id'),
+                   Question.question_text.label('title'), Question.answer_text.label('body'),
+                   Lesson.topic, Lesson.subject, Lesson.age_group_target,
+                   fulltext_relevance((Question.question_text,), query).label('score'))
+            .join(Lesson, Question.lesson_id == Lesson.id)
+            .where(fulltext_filter((Question.question_text,), query), *lesson_filters)
+        )
+    
+    rows = []
+    if searches:
+        # The time limit is a statement-level hint, so it goes on the union's first SELECT
+        searches[0] = searches[0].prefix_with(f'/*+ MAX_EXECUTION_TIME({SEARCH_TIMEOUT_MS}) */', dialect='mysql')
+        
+        # Run every content type's search as a single UNION ALL statement, best matches of any type first;
+        # one row past the limit tells whether there are more without counting them
+        try:
+            rows = db.session.execute(
+                union_all(*searches).order_by(desc('score')).limit(SEARCH_RESULT_LIMIT + 1)
+            ).all()
+        except OperationalError as e:
+            # A search that runs too long finds nothing rather than tying up the connection
+            if e.orig.args[0] != QUERY_TIMEOUT_ERROR:
+                raise
+    
+    has_more = len(rows) > SEARCH_RESULT_LIMIT
+    rows = rows[:SEARCH_RESULT_LIMIT]
+    
     filtered_results = []
-    for result in sample_results:
-        if content_type != 'all' and result['type'] != content_type:
-            continue
-        if subject != 'all' and result.get('subject') != subject:
-            continue
-        if age_group != 'all' and result.get('age_group') != age_group:
-            continue
-        filtered_results.append(result)
+    for row in rows:
+        if row.type == 'lesson':
+            filtered_results.append({
+                'type': 'lesson',
+                'id': row.id,
+                'title': row.title,
+                'description': row.body,
+                'topic': row.topic,
+                'subject': row.subject,
+                'age_group': row.age_group_target.value,
+                'url': url_for('lessons.view', lesson_id=row.id)
+            })
+        elif row.type == 'flashcard':
+            filtered_results.append({
+                'type': 'flashcard',
+                'id': row.id,
+                'term': row.title,
+                'definition': row.body,
+                'lesson_id': row.lesson_id,
+                'url': url_for('lessons.flashcards', lesson_id=row.lesson_id)
+            })
+        else:
+            filtered_results.append({
+                'type': 'question',
+                'id': row.id,
+                'question': row.title,
+                'lesson_id': row.lesson_id,
+                'url': url_for('lessons.questions', lesson_id=row.lesson_id)
+            })
     
     return render_template('main/search.html', 
                          results=filtered_results, 
                          query=query, 
-                         total=len(filtered_results))
+                         total=len(filtered_results),
+                         has_more=has_more)
 
 # Convenience redirects for the AI web search feature
 @main_bp.route('/web-search')
 @main_bp.route('/google-search')
 def redirect_web_search():
-    from flask import redirect, url_for
     return redirect(url_for('ai_services.web_search'))
 
 @main_bp.route('/about')
@@ -131,32 +205,23 @@ def search_autocomplete():
     if len(query) < 2:
         return jsonify({'suggestions': []})
     
-    # Get suggestions from search index
-    suggestions = SearchIndex.query.filter(
-        SearchIndex.searchable_text.contains(query)
-    ).limit(10).all()
-    
-    # Extract unique suggestions
-    unique_suggestions = []
-    seen = set()
-    
-    for suggestion in suggestions:
-        # Extract relevant text snippets
-        text = suggestion.searchable_text
-        words = text.split()
-        
-        for word in words:
-            if query.lower() in word.lower() and word.lower() not in seen:
-                seen.add(word.lower())
-                unique_suggestions.append(word)
-                
-                if len(unique_suggestions) >= 10:
-                    break
-        
-        if len(unique_suggestions) >= 10:
-            break
+    # Complete the typed prefix from the indexed vocabulary; a prefix LIKE can use the primary key index
+    prefix = query.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    try:
+        suggestions = db.session.execute(
+            select(SearchTerm.term)
+            .prefix_with(f'/*+ MAX_EXECUTION_TIME({AUTOCOMPLETE_TIMEOUT_MS}) */', dialect='mysql')
+            .where(SearchTerm.term.like(f'{prefix}%', escape='\\'))
+            .order_by(func.length(SearchTerm.term), SearchTerm.term)
+            .limit(10)
+        ).scalars().all()
+    except OperationalError as e:
+        # A keystroke that runs too long gets no suggestions rather than holding the connection
+        if e.orig.args[0] != QUERY_TIMEOUT_ERROR:
+            raise
+        suggestions = []
     
-    return jsonify({'suggestions': unique_suggestions[:10]})
+    return jsonify({'suggestions': suggestions})
 
 @main_bp.route('/browse')
 def browse():
@@ -170,37 +235,70 @@ def browse():
     age_group = request.args.get('age_group', 'all')
     difficulty = request.args.get('difficulty', 'all')
     
-    # Build query
-    query = Lesson.query.filter_by(is_published=True)
+    # Build query, loading only the card fields and each lesson's teacher up front
+    query = Lesson.query.options(*list_loading(
+        load_only(Lesson.id, Lesson.title, Lesson.description, Lesson.topic, Lesson.subject,
+                  Lesson.age_group_target, Lesson.difficulty_level, Lesson.estimated_duration,
+                  Lesson.teacher_id, Lesson.created_at),
+        selectinload(Lesson.teacher).load_only(User.id, User.username, User.first_name, User.last_name)
+    )).filter_by(is_published=True)
     
     if subject != 'all':
         query = query.filter(Lesson.subject == subject)
     
     if age_group != 'all':
-        query = query.filter(Lesson.age_group_target == age_group)
+        try:
+            query = query.filter(Lesson.age_group_target == AgeGroup(age_group))
+        except ValueError:
+            pass
     
     if difficulty != 'all':
         query = query.filter(Lesson.difficulty_level == difficulty)
     
-    # Get lessons
-    lessons = query.order_by(Lesson.created_at.desc()).limit(50).all()
+    # Get lessons, newest first; after_created_at/after_id page further back by keyset
+    after = parse_lesson_cursor(request.args.get('after_created_at'), request.args.get('after_id', type=int))
+    if after:
+        after_created_at, after_id = after
+        query = query.filter(or_(
+            Lesson.created_at < after_created_at,
+            and_(Lesson.created_at == after_created_at, Lesson.id < after_id)
+        ))
+    
+    lessons = query.order_by(Lesson.created_at.desc(), Lesson.id.desc()).limit(BROWSE_PAGE_SIZE).all()
+    
+    # A full page may have more lessons behind it
+    next_cursor = None
+    if len(lessons) == BROWSE_PAGE_SIZE:
+        next_cursor = {'after_created_at': lessons[-1].created_at.isoformat(), 'after_id': lessons[-1].id}
     
     # Get available subjects and age groups for filters
-    subjects = db.session.query(Lesson.subject).distinct().all()
-    age_groups = db.session.query(Lesson.age_group_target).distinct().all()
-    difficulty_levels = db.session.query(Lesson.difficulty_level).distinct().all()
+    facets = get_lesson_filter_facets()
     
     return render_template('main/browse.html',
                          lessons=lessons,
-                         subjects=[s[0] for s in subjects],
-                         age_groups=[ag[0].value for ag in age_groups],
-                         difficulty_levels=[dl[0] for dl in difficulty_levels],
+                         subjects=facets['subjects'],
+                         age_groups=facets['age_groups'],
+                         difficulty_levels=facets['difficulty_levels'],
+                         next_cursor=next_cursor,
                          current_filters={
                              'subject': subject,
                              'age_group': age_group,
                              'difficulty': difficulty
                          })
 
+def parse_lesson_cursor(after_created_at, after_id):
+    """
+    Parse the browse page's keyset cursor, or return None if it is absent or malformed.
+    """
+    
+    if not after_created_at or after_id is None:
+        return None
+    
+    try:
+        return datetime.fromisoformat(after_created_at), after_id
+    except ValueError:
+        return None
+
 
 
 @main_bp.route('/accessibility')
@@ -220,18 +318,8 @@ def api_stats():
     """
     
     try:
-        stats = {
-            'total_lessons': Lesson.query.count(),
-            'total_flashcards': Flashcard.query.count(),
-            'total_questions': Question.query.count(),
-            'total_resources': ExternalResource.query.count(),
-            'published_lessons': Lesson.query.filter_by(is_published=True).count(),
-            'ai_generated_content': Flashcard.query.filter_by(ai_generated=True).count() + 
-                                   Question.query.filter_by(ai_generated=True).count()
-        }
-        
-        return jsonify({'success': True, 'stats': stats})
-        
+        return jsonify({'success': True, 'stats': get_platform_stats()})
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -248,23 +336,22 @@ def api_age_group_content(age_group):
         if age_group not in valid_age_groups:
             return jsonify({'error': 'Invalid age group'}), 400
         
-        # Get content for specific age group
-        lessons = Lesson.query.filter_by(
-            age_group_target=age_group,
-            is_published=True
-        ).order_by(Lesson.created_at.desc()).limit(10).all()
+        # Get content for specific age group as plain rows, skipping ORM instances
+        rows = db.session.execute(
+            select(
+                Lesson.id,
+                Lesson.title,
+                Lesson.topic,
+                Lesson.subject,
+                Lesson.difficulty_level.label('difficulty'),
+                Lesson.estimated_duration.label('duration')
+            )
+            .where(Lesson.age_group_target == AgeGroup(age_group), Lesson.is_published == True)
+            .order_by(Lesson.created_at.desc())
+            .limit(10)
+        ).mappings()
         
-        content = []
-        for lesson in lessons:
-            content.append({
-                'id': lesson.id,
-                'title': lesson.title,
-                'topic': lesson.topic,
-                'subject': lesson.subject,
-                'difficulty': lesson.difficulty_level,
-                'duration': lesson.estimated_duration,
-                'url': f'/lessons/{lesson.id}'
-            })
+        content = [{**row, 'url': f'/lessons/{row["id"]}'} for row in rows]
         
         return jsonify({
             'success': True,
@@ -272,6 +359,6 @@ def api_age_group_content(age_group):
             'content': content,
             'total': len(content)
         })
-        
+    
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
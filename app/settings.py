@@ -11,11 +11,36 @@ This module provides:
 
 from flask import Blueprint, render_template, request, jsonify, current_app
 from flask_login import login_required, current_user
-from database.models import db, User
-import json
+from database.models import db, User, preference_overrides, invalidate_cached_user
+from app.auth import invalidate_user_info
+from sqlalchemy import update
 
 settings_bp = Blueprint('settings', __name__, url_prefix='/settings')
 
+# Preference keys each preferences endpoint may update
+THEME_FIELDS = ('theme_preference', 'color_scheme', 'font_size', 'font_family', 'background_color', 'accent_color')
+LAYOUT_FIELDS = ('sidebar_position', 'content_width', 'navigation_style', 'card_layout')
+ACCESSIBILITY_FIELDS = ('high_contrast', 'reduced_motion', 'screen_reader_support', 'focus_indicators')
+
+def update_user_preferences(fields, data):
+    """
+    Merge the whitelisted fields present in data into the current user's preferences with one UPDATE.
+    Returns the preferences as stored, so callers need not reload the user after the commit expires it.
+    """
+    preferences = current_user.get_preferences()
+    values = {field: data[field] for field in fields if field in data}
+    if values:
+        user_id = current_user.id
+        preferences = {**preferences, **values}
+        db.session.execute(
+            update(User).where(User.id == user_id).values(preferences=preference_overrides(preferences))
+        )
+        db.session.commit()
+        invalidate_cached_user(user_id)
+        invalidate_user_info(user_id)
+    
+    return preferences
+
 @settings_bp.route('/')
 @login_required
 def index():
@@ -48,27 +73,9 @@ def update_theme():
         data = request.get_json()
         
         # Update theme preferences
-        if 'theme_preference' in data:
-            current_user.theme_preference = data['theme_preference']
-        
-        if 'color_scheme' in data:
-            current_user.color_scheme = data['color_scheme']
-        
-        if 'font_size' in data:
-            current_user.font_size = data['font_size']
-        
-        if 'font_family' in data:
-            current_user.font_family = data['font_family']
+        preferences = update_user_preferences(THEME_FIELDS, data)
         
-        if 'background_color' in data:
-            current_user.background_color = data['background_color']
-        
-        if 'accent_color' in data:
-            current_user.accent_color = data['accent_color']
-        
-        db.session.commit()
-        
-        return jsonify({'success': True, 'message': 'Theme updated successfully'})
+        return jsonify({'success': True, 'message': 'Theme updated successfully', 'preferences': preferences})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -81,21 +88,9 @@ def update_layout():
         data = request.get_json()
         
         # Update layout preferences
-        if 'sidebar_position' in data:
-            current_user.sidebar_position = data['sidebar_position']
-        
-        if 'content_width' in data:
-            current_user.content_width = data['content_width']
+        preferences = update_user_preferences(LAYOUT_FIELDS, data)
         
-        if 'navigation_style' in data:
-            current_user.navigation_style = data['navigation_style']
-        
-        if 'card_layout' in data:
-            current_user.card_layout = data['card_layout']
-        
-        db.session.commit()
-        
-        return jsonify({'success': True, 'message': 'Layout updated successfully'})
+        return jsonify({'success': True, 'message': 'Layout updated successfully', 'preferences': preferences})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -108,21 +103,9 @@ def update_accessibility():
         data = request.get_json()
         
         # Update accessibility preferences
-        if 'high_contrast' in data:
-            current_user.high_contrast = data['high_contrast']
-        
-        if 'reduced_motion' in data:
-            current_user.reduced_motion = data['reduced_motion']
+        preferences = update_user_preferences(ACCESSIBILITY_FIELDS, data)
         
-        if 'screen_reader_support' in data:
-            current_user.screen_reader_support = data['screen_reader_support']
-        
-        if 'focus_indicators' in data:
-            current_user.focus_indicators = data['focus_indicators']
-        
-        db.session.commit()
-        
-        return jsonify({'success': True, 'message': 'Accessibility settings updated successfully'})
+        return jsonify({'success': True, 'message': 'Accessibility settings updated successfully', 'preferences': preferences})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -132,24 +115,7 @@ def update_accessibility():
 def get_preferences():
     """Get current user's preferences."""
     try:
-        preferences = {
-            'theme_preference': current_user.theme_preference,
-            'color_scheme': current_user.color_scheme,
-            'font_size': current_user.font_size,
-            'font_family': current_user.font_family,
-            'background_color': current_user.background_color,
-            'accent_color': current_user.accent_color,
-            'sidebar_position': current_user.sidebar_position,
-            'content_width': current_user.content_width,
-            'navigation_style': current_user.navigation_style,
-            'card_layout': current_user.card_layout,
-            'high_contrast': current_user.high_contrast,
-            'reduced_motion': current_user.reduced_motion,
-            'screen_reader_support': current_user.screen_reader_support,
-            'focus_indicators': current_user.focus_indicators
-        }
-        
-        return jsonify({'success': True, 'preferences': preferences})
+        return jsonify({'success': True, 'preferences': current_user.get_preferences()})
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -159,23 +125,13 @@ def get_preferences():
 def reset_preferences():
     """Reset user's preferences to defaults."""
     try:
-        # Reset to default values
-        current_user.theme_preference = 'modern'
-        current_user.color_scheme = 'default'
-        current_user.font_size = 'medium'
-        current_user.font_family = 'system'
-        current_user.background_color = '#ffffff'
-        current_user.accent_color = '#4f46e5'
-        current_user.sidebar_position = 'left'
-        current_user.content_width = 'standard'
-        current_user.navigation_style = 'standard'
-        current_user.card_layout = 'grid'
-        current_user.high_contrast = False
-        current_user.reduced_motion = False
-        current_user.screen_reader_support = False
-        current_user.focus_indicators = True
+        # Reset to default values; defaults are never stored, so this clears the overrides
+        user_id = current_user.id
+        db.session.execute(update(User).where(User.id == user_id).values(preferences={}))
         
         db.session.commit()
+        invalidate_cached_user(user_id)
+        invalidate_user_info(user_id)
         
         return jsonify({'success': True, 'message': 'Preferences reset to defaults'})
         
@@ -9,11 +9,53 @@ This module defines all database tables and relationships needed for:
 - External resources and content indexing
 """
 
-from app import db, login_manager
+from app import db, login_manager, cache, cache_is_shared
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
+from sqlalchemy import event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import deferred, object_session, validates
+from sqlalchemy.sql.expression import FunctionElement
+from itertools import islice
 import enum
+import os
+import re
+
+# Argon2id hasher for user passwords; the defaults keep a verification well under 200ms
+# and can be retuned per deployment, existing hashes are upgraded on next login
+password_hasher = PasswordHasher(
+    time_cost=int(os.environ.get('ARGON2_TIME_COST', 2)),
+    memory_cost=int(os.environ.get('ARGON2_MEMORY_COST', 19456)),
+    parallelism=int(os.environ.get('ARGON2_PARALLELISM', 1)),
+    hash_len=int(os.environ.get('ARGON2_HASH_LEN', 32))
+)
+
+def verify_password(password_hash, password):
+    """Verify a password against an Argon2id hash or a legacy werkzeug hash."""
+    if not password_hash.startswith('$argon2'):
+        return check_password_hash(password_hash, password)
+    try:
+        return password_hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+class utcnow(FunctionElement):
+    """Current UTC time computed by the database, for timestamp column defaults."""
+    type = db.DateTime()
+    inherit_cache = True
+
+@compiles(utcnow)
+def compile_utcnow(element, compiler, **kw):
+    # MySQL sessions are pinned to UTC in create_app
+    return 'CURRENT_TIMESTAMP'
+
+@compiles(utcnow, 'sqlite')
+def compile_utcnow_sqlite(element, compiler, **kw):
+    # SQLite compares datetimes as text; write microseconds like SQLAlchemy's bound values,
+    # or a row and a cursor from the same second would compare unequal
+    return "(STRFTIME('%Y-%m-%d %H:%M:%f000', 'now'))"
 
 # Enum for user roles and age groups
 class UserRole(enum.Enum):
@@ -22,6 +64,9 @@ class UserRole(enum.Enum):
     ADMIN = "admin"
     PARENT = "parent"
 
+# Roles allowed to create and manage lessons
+TEACHING_ROLES = frozenset({UserRole.TEACHER, UserRole.ADMIN})
+
 class AgeGroup(enum.Enum):
     CHILDREN = "children"      # 5-12 years
     TEENS = "teens"            # 13-17 years
@@ -45,6 +90,34 @@ class ActivityType(enum.Enum):
     SEARCH = "search"
     DOWNLOAD = "download"
 
+# UI preferences every user starts with; stored preferences override these key by key
+DEFAULT_PREFERENCES = {
+    'theme_preference': 'modern',
+    'color_scheme': 'default',
+    'font_size': 'medium',
+    'font_family': 'system',
+    'background_color': '#ffffff',
+    'accent_color': '#4f46e5',
+    'sidebar_position': 'left',
+    'content_width': 'standard',
+    'navigation_style': 'standard',
+    'card_layout': 'grid',
+    'high_contrast': False,
+    'reduced_motion': False,
+    'screen_reader_support': False,
+    'focus_indicators': True
+}
+
+def preference_overrides(preferences):
+    """Keep only the preferences that differ from DEFAULT_PREFERENCES, which is all a user row stores."""
+    return {
+        key: value for key, value in preferences.items()
+        if key not in DEFAULT_PREFERENCES or DEFAULT_PREFERENCES[key] != value
+    }
+
+# Longest lesson tag the tags index holds
+LESSON_TAG_MAX_LENGTH = 100
+
 # User model with role-based access control
 class User(UserMixin, db.Model):
     """User model supporting multiple roles and age groups."""
@@ -63,49 +136,54 @@ class User(UserMixin, db.Model):
     profile_picture = db.Column(db.String(255), nullable=True)
     bio = db.Column(db.Text, nullable=True)
     
-    # Preferences for UI customization
-    theme_preference = db.Column(db.String(20), default='modern')
-    color_scheme = db.Column(db.String(20), default='default')
-    font_size = db.Column(db.String(20), default='medium')
-    font_family = db.Column(db.String(50), default='system')
-    background_color = db.Column(db.String(7), default='#ffffff')
-    accent_color = db.Column(db.String(7), default='#4f46e5')
-    sidebar_position = db.Column(db.String(10), default='left')
-    content_width = db.Column(db.String(20), default='standard')
-    navigation_style = db.Column(db.String(20), default='standard')
-    card_layout = db.Column(db.String(20), default='grid')
-    high_contrast = db.Column(db.Boolean, default=False)
-    reduced_motion = db.Column(db.Boolean, default=False)
-    screen_reader_support = db.Column(db.Boolean, default=False)
-    focus_indicators = db.Column(db.Boolean, default=True)
-    accessibility_features = db.Column(db.JSON, default={})
+    # Preferences for UI customization, stored as one JSON document holding only the
+    # values a user changed from DEFAULT_PREFERENCES, so most rows carry an empty object
+    preferences = db.Column(db.JSON, nullable=False, default=dict)
+    accessibility_features = db.Column(db.JSON, default=dict)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
     last_login = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     
     # Relationships
-    lessons_created = db.relationship('Lesson', backref='teacher', lazy='dynamic')
-    revision_logs = db.relationship('RevisionLog', backref='user', lazy='dynamic')
-    engagement_metrics = db.relationship('EngagementMetric', backref='user', lazy='dynamic')
-    questions_asked = db.relationship('Question', backref='student', lazy='dynamic')
+    lessons_created = db.relationship('Lesson', backref='teacher')
+    # Activity histories grow without bound; write-only so they are never loaded whole, query them explicitly
+    # (the dashboards aggregate them per user in SQL, so load_user never needs to preload them)
+    revision_logs = db.relationship('RevisionLog', backref='user', lazy='write_only')
+    engagement_metrics = db.relationship('EngagementMetric', backref='user', lazy='write_only')
+    questions_asked = db.relationship('Question', backref='student')
     
     def set_password(self, password):
         """Hash and set user password."""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verify user password."""
-        return check_password_hash(self.password_hash, password)
+        """Verify user password, upgrading outdated hashes on success."""
+        if not verify_password(self.password_hash, password):
+            return False
+        
+        # Rehash legacy PBKDF2 hashes and stale Argon2 parameters; saved with the caller's commit
+        if not self.password_hash.startswith('$argon2') or password_hasher.check_needs_rehash(self.password_hash):
+            self.set_password(password)
+        
+        return True
     
     def get_full_name(self):
         """Get user's full name."""
         return f"{self.first_name} {self.last_name}"
     
+    def get_preferences(self):
+        """Get user's UI preferences, with defaults for any not yet stored."""
+        return {**DEFAULT_PREFERENCES, **(self.preferences or {})}
+    
+    def pref(self, key, default=None):
+        """Get a single UI preference, falling back to DEFAULT_PREFERENCES and then default."""
+        return (self.preferences or {}).get(key, DEFAULT_PREFERENCES.get(key, default))
+    
     def is_teacher(self):
         """Check if user is a teacher."""
-        return self.role in [UserRole.TEACHER, UserRole.ADMIN]
+        return self.role in TEACHING_ROLES
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -118,11 +196,11 @@ class Document(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
     subject = db.Column(db.String(100), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    content_length = db.Column(db.Integer, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    content_length = db.Column(db.Integer)
     file_type = db.Column(db.String(20), nullable=False)
     source_url = db.Column(db.String(500))  # For YouTube/online sources
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, server_default=utcnow())
     is_processed = db.Column(db.Boolean, default=False)
     
     # Relationships
@@ -137,12 +215,13 @@ class Content(db.Model):
     
     id = db.Column(db.Integer, primary_key=True)
     document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
-    raw_content = db.Column(db.Text, nullable=False)
-    ai_generated_notes = db.Column(db.Text)
+    # Large bodies only the content page shows; deferred as a group so that page loads both at once
+    raw_content = deferred(db.Column(db.Text, nullable=False), group='body')
+    ai_generated_notes = deferred(db.Column(db.Text), group='body')
     ai_generated_summary = db.Column(db.Text)
     key_concepts = db.Column(db.Text)
     content_metadata = db.Column(db.JSON)  # Store additional metadata
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     
     # Relationships
@@ -159,7 +238,7 @@ class AIChat(db.Model):
     user_message = db.Column(db.Text, nullable=False)
     ai_response = db.Column(db.Text, nullable=False)
     context = db.Column(db.String(100), default='general')
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, server_default=utcnow())
     
     # Relationships
     user = db.relationship('User', backref='ai_chats')
@@ -167,11 +246,22 @@ class AIChat(db.Model):
     def __repr__(self):
         return f'<AIChat {self.id}>'
 
+# Newest-first index backing a user's chat history
+db.Index('ix_aichat_user_ts', AIChat.user_id, AIChat.timestamp.desc())
+
 # Lesson model for storing educational content
 class Lesson(db.Model):
     """Lesson model for storing various types of educational content."""
     
     __tablename__ = 'lessons'
+    __table_args__ = (
+        db.Index('ix_lesson_age_group', 'age_group_target'),
+        db.Index('ix_lesson_teacher_published', 'teacher_id', 'is_published'),
+        # Full-text index backing lesson search; MySQL only, other databases fall back to LIKE
+        db.Index('ix_lesson_search_fulltext', 'title', 'topic', 'description', 'ai_summary', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+        # Multi-valued index over the tags array; MySQL uses it for JSON_CONTAINS on the same tags->'$' expression
+        db.Index('ix_lesson_tags', db.text(f"(CAST(tags->'$' AS CHAR({LESSON_TAG_MAX_LENGTH}) ARRAY))")).ddl_if(dialect='mysql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -180,44 +270,61 @@ class Lesson(db.Model):
     subject = db.Column(db.String(100), nullable=False)
     
     # Content details
-    raw_input = db.Column(db.Text, nullable=True)  # Original text input
+    raw_input = deferred(db.Column(db.Text, nullable=True))  # Original text input, never shown; loaded only on access
     format_type = db.Column(db.Enum(ContentFormat), nullable=False)
     file_path = db.Column(db.String(500), nullable=True)  # For uploaded files
     external_url = db.Column(db.String(500), nullable=True)  # For YouTube links etc.
     
     # AI-generated content
     ai_summary = db.Column(db.Text, nullable=True)
-    key_points = db.Column(db.JSON, nullable=True)  # List of key concepts
+    key_points = deferred(db.Column(db.JSON, nullable=True))  # List of key concepts; undefer where a single lesson shows them
     difficulty_level = db.Column(db.String(20), default='intermediate')
     estimated_duration = db.Column(db.Integer, nullable=True)  # in minutes
     
     # Metadata
     teacher_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     age_group_target = db.Column(db.Enum(AgeGroup), nullable=False)
-    tags = db.Column(db.JSON, default=[])  # List of tags for search
+    tags = db.Column(db.JSON, default=list)  # List of tags for search
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    updated_at = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
     is_published = db.Column(db.Boolean, default=False)
     
     # Relationships
-    flashcards = db.relationship('Flashcard', backref='lesson', lazy='dynamic', cascade='all, delete-orphan')
-    questions = db.relationship('Question', backref='lesson', lazy='dynamic', cascade='all, delete-orphan')
-    revision_logs = db.relationship('RevisionLog', backref='lesson', lazy='dynamic')
+    flashcards = db.relationship('Flashcard', back_populates='lesson', cascade='all, delete-orphan')
+    questions = db.relationship('Question', back_populates='lesson', cascade='all, delete-orphan')
+    revision_logs = db.relationship('RevisionLog', backref='lesson', lazy='write_only')
+    
+    @validates('tags')
+    def validate_tags(self, key, tags):
+        """Store tags as non-empty strings that fit the tags index, which rejects longer values."""
+        if tags is None:
+            return None
+        tags = [str(tag).strip()[:LESSON_TAG_MAX_LENGTH] for tag in tags]
+        return [tag for tag in tags if tag]
     
     def __repr__(self):
         return f'<Lesson {self.title}>'
 
+# Newest-first index backing the per-age-group featured and recommended lesson lists
+db.Index('ix_lesson_published_age_created', Lesson.is_published, Lesson.age_group_target, Lesson.created_at.desc())
+
+# Newest-first index backing the browse page's keyset pagination
+db.Index('ix_lesson_published_created', Lesson.is_published, Lesson.created_at.desc(), Lesson.id.desc())
+
 # Flashcard model for AI-generated study materials
 class Flashcard(db.Model):
     """Flashcard model for AI-generated study materials."""
     
     __tablename__ = 'flashcards'
+    __table_args__ = (
+        db.Index('ix_flashcard_search_fulltext', 'term', 'definition', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=True)  # Can be linked to lesson or content
-    content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=True)  # Link to AI-processed content
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=True, index=True)  # Can be linked to lesson or content
+    content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=True, index=True)  # Link to AI-processed content
     
     # Flashcard content
     term = db.Column(db.String(200), nullable=False)
@@ -230,7 +337,10 @@ class Flashcard(db.Model):
     confidence_score = db.Column(db.Float, nullable=True)  # AI confidence in generation
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    
+    # Relationships
+    lesson = db.relationship('Lesson', back_populates='flashcards')
     
     def __repr__(self):
         return f'<Flashcard {self.term}>'
@@ -240,10 +350,13 @@ class Question(db.Model):
     """Question model for practice questions and assessments."""
     
     __tablename__ = 'questions'
+    __table_args__ = (
+        db.Index('ix_question_search_fulltext', 'question_text', mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=True)  # Can be linked to lesson or content
-    content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=True)  # Link to AI-processed content
+    lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=True, index=True)  # Can be linked to lesson or content
+    content_id = db.Column(db.Integer, db.ForeignKey('content.id'), nullable=True, index=True)  # Link to AI-processed content
     student_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # For student questions
     
     # Question content
@@ -258,7 +371,10 @@ class Question(db.Model):
     difficulty_level = db.Column(db.String(20), default='medium')
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    
+    # Relationships
+    lesson = db.relationship('Lesson', back_populates='questions')
     
     def __repr__(self):
         return f'<Question {self.question_text[:50]}...>'
@@ -283,11 +399,15 @@ class RevisionLog(db.Model):
     notes = db.Column(db.Text, nullable=True)  # User notes during revision
     
     # Timestamps
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, server_default=utcnow())
     
     def __repr__(self):
         return f'<RevisionLog {self.user_id} - {self.lesson_id}>'
 
+# Newest-first indexes backing per-lesson progress and recent-history lookups
+db.Index('ix_revlog_user_lesson_ts', RevisionLog.user_id, RevisionLog.lesson_id, RevisionLog.timestamp.desc())
+db.Index('ix_revlog_user_ts', RevisionLog.user_id, RevisionLog.timestamp.desc())
+
 # External resources for content integration
 class ExternalResource(db.Model):
     """External resource model for integrating content from other platforms."""
@@ -304,18 +424,18 @@ class ExternalResource(db.Model):
     format_type = db.Column(db.Enum(ContentFormat), nullable=False)
     
     # Content processing
-    raw_content = db.Column(db.Text, nullable=True)  # Extracted content
-    processed_content = db.Column(db.JSON, nullable=True)  # AI-processed content
+    raw_content = deferred(db.Column(db.Text, nullable=True))  # Extracted content
+    processed_content = deferred(db.Column(db.JSON, nullable=True))  # AI-processed content
     ai_summary = db.Column(db.Text, nullable=True)
     
     # Metadata
     age_group_target = db.Column(db.Enum(AgeGroup), nullable=False)
     difficulty_level = db.Column(db.String(20), default='intermediate')
-    tags = db.Column(db.JSON, default=[])
+    tags = db.Column(db.JSON, default=list)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    last_updated = db.Column(db.DateTime, server_default=utcnow(), onupdate=utcnow())
     is_active = db.Column(db.Boolean, default=True)
     
     def __repr__(self):
@@ -326,6 +446,10 @@ class EngagementMetric(db.Model):
     """Engagement metrics for tracking user activity and behavior."""
     
     __tablename__ = 'engagement_metrics'
+    __table_args__ = (
+        db.Index('ix_engagement_user_ts', 'user_id', 'timestamp'),
+        db.Index('ix_engagement_user_type', 'user_id', 'activity_type'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -336,11 +460,21 @@ class EngagementMetric(db.Model):
     session_duration = db.Column(db.Integer, nullable=True)  # Session duration in seconds
     
     # Timestamps
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, server_default=utcnow())
     
     def __repr__(self):
         return f'<EngagementMetric {self.user_id} - {self.activity_type}>'
 
+# Newest-first index backing the admin activity feed's keyset pagination
+db.Index('ix_engagement_ts_desc', EngagementMetric.timestamp.desc(), EngagementMetric.id.desc())
+
+# Expression index backing per-lesson engagement lookups on activity_data's lesson_id key
+db.Index(
+    'ix_engagement_lesson_activity',
+    EngagementMetric.activity_data['lesson_id'].as_integer(),
+    EngagementMetric.activity_type
+)
+
 # User session management
 class UserSession(db.Model):
     """User session model for managing active sessions and preferences."""
@@ -356,8 +490,8 @@ class UserSession(db.Model):
     progress_data = db.Column(db.JSON, nullable=True)  # Current progress state
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_activity = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=utcnow())
+    last_activity = db.Column(db.DateTime, server_default=utcnow())
     expires_at = db.Column(db.DateTime, nullable=False)
     
     def __repr__(self):
@@ -368,6 +502,9 @@ class SearchIndex(db.Model):
     """Search index for fast content retrieval and search functionality."""
     
     __tablename__ = 'search_index'
+    __table_args__ = (
+        db.Index('ix_search_index_content', 'content_type', 'content_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -377,18 +514,113 @@ class SearchIndex(db.Model):
     searchable_text = db.Column(db.Text, nullable=False)  # Text content for search
     
     # Search metadata
-    keywords = db.Column(db.JSON, default=[])  # Extracted keywords
-    topic_tags = db.Column(db.JSON, default=[])  # Topic tags
-    subject_tags = db.Column(db.JSON, default=[])  # Subject tags
+    keywords = db.Column(db.JSON, default=list)  # Extracted keywords
+    topic_tags = db.Column(db.JSON, default=list)  # Topic tags
+    subject_tags = db.Column(db.JSON, default=list)  # Subject tags
     
     # Timestamps
-    indexed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    indexed_at = db.Column(db.DateTime, server_default=utcnow())
     
     def __repr__(self):
         return f'<SearchIndex {self.content_type}:{self.content_id}>'
 
+# Words pulled from indexed text into the autocomplete vocabulary
+SEARCH_TERM_PATTERN = re.compile(r'\w{2,100}')
+
+# Distinct words of the search index, backing prefix autocomplete
+class SearchTerm(db.Model):
+    """Lowercased vocabulary of the search index for autocomplete suggestions."""
+    
+    __tablename__ = 'search_terms'
+    
+    term = db.Column(db.String(100), primary_key=True)
+    
+    def __repr__(self):
+        return f'<SearchTerm {self.term}>'
+
+def search_terms_in(text):
+    """Distinct autocomplete terms of an indexed text."""
+    # Lowercase the text once so the compiled pattern yields final terms directly
+    return set(SEARCH_TERM_PATTERN.findall((text or '').lower()))
+
+def insert_search_terms(connection, terms):
+    """
+    Add terms to the autocomplete vocabulary in one statement, skipping any already present.
+    Concurrent writers adding the same term cannot collide on the primary key.
+    """
+    if terms:
+        statement = db.insert(SearchTerm).prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+        connection.execute(statement, [{'term': term} for term in terms])
+
+@event.listens_for(SearchIndex, 'after_insert')
+@event.listens_for(SearchIndex, 'after_update')
+def add_search_terms(mapper, connection, target):
+    """Add any new words of an indexed text to the autocomplete vocabulary."""
+    insert_search_terms(connection, search_terms_in(target.searchable_text))
+
+# Rows sent per bulk INSERT; larger batches stop paying off while their memory keeps growing
+BULK_INSERT_BATCH_SIZE = 10_000
+
+def chunked(iterable, size):
+    """Yield lists of up to size items from any iterable, without materializing it."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def bulk_insert(model, rows, batch_size=BULK_INSERT_BATCH_SIZE):
+    """
+    Insert many rows of plain dicts in as few statements as possible.
+    Rows may be any iterable and are sent in batches, so large ingests can be streamed.
+    Skips the unit of work and mapper events, so callers clear any caches those events would.
+    """
+    for batch in chunked(rows, batch_size):
+        db.session.execute(db.insert(model), batch)
+
+# Seconds a loaded user row is reused across requests before being read again, with a shared cache
+USER_CACHE_TIMEOUT = 60
+
+def user_cache_key(user_id):
+    """Cache key for a user's loaded row."""
+    return f'user:{user_id}'
+
+def invalidate_cached_user(user_id):
+    """Drop a user's cached row so the next request reads it from the database."""
+    cache.delete(user_cache_key(user_id))
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def record_written_user(mapper, connection, target):
+    """Note each user the ORM writes; bulk UPDATEs must invalidate themselves."""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('written_user_ids', set()).add(target.id)
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_written_users(session):
+    """Drop the cached rows of users written in the committed transaction."""
+    # Invalidating at flush time would let another request re-cache the old row before the commit
+    for user_id in session.info.pop('written_user_ids', ()):
+        invalidate_cached_user(user_id)
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_written_users(session):
+    """Rolled-back writes never reached the database, so the cached rows stay valid."""
+    session.info.pop('written_user_ids', None)
+
 # User loader for Flask-Login
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user for Flask-Login."""
-    return User.query.get(int(user_id))
+    """Load user for Flask-Login, reusing a recently loaded row without a SELECT."""
+    # A per-process cache would keep serving a row that another worker changed
+    if not cache_is_shared():
+        return db.session.get(User, int(user_id))
+    
+    user = cache.get(user_cache_key(user_id))
+    if user is not None:
+        # Attach the cached copy to this request's session as-is
+        return db.session.merge(user, load=False)
+    
+    user = db.session.get(User, int(user_id))
+    if user is not None:
+        cache.set(user_cache_key(user_id), user, timeout=USER_CACHE_TIMEOUT)
+    return user
@@ -8,18 +8,28 @@ import os
 import sys
 import subprocess
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+def venv_bin(name):
+    """Path to an executable inside the project's virtual environment"""
+    if os.name == 'nt':  # Windows
+        return os.path.join('venv', 'Scripts', name)
+    return os.path.join('venv', 'bin', name)  # Unix/Linux/macOS
+
 def run_command(command, description):
-    """Run a command and handle errors"""
+    """Run a command given as an argument list, without a shell, and handle errors"""
     print(f"🔄 {description}...")
     try:
-        result = subprocess.run(command, shell=True, check=True, capture_output=True, text=True)
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
         print(f"✅ {description} completed successfully")
         return result.stdout
     except subprocess.CalledProcessError as e:
         print(f"❌ {description} failed: {e.stderr}")
         sys.exit(1)
+    except OSError as e:
+        print(f"❌ {description} failed: {e}")
+        sys.exit(1)
 
 def check_requirements():
     """Check if required tools are installed"""
@@ -33,33 +43,19 @@ def check_requirements():
     # Check if virtual environment exists
     if not os.path.exists('venv'):
         print("📦 Creating virtual environment...")
-        run_command('python -m venv venv', 'Virtual environment creation')
+        run_command([sys.executable, '-m', 'venv', 'venv'], 'Virtual environment creation')
     
     print("✅ Requirements check completed")
 
-def setup_environment():
-    """Setup the development environment"""
-    print("🛠️ Setting up development environment...")
-    
-    # Activate virtual environment and install dependencies
-    if os.name == 'nt':  # Windows
-        activate_cmd = 'venv\\Scripts\\activate'
-        pip_cmd = 'venv\\Scripts\\pip'
-    else:  # Unix/Linux/macOS
-        activate_cmd = 'source venv/bin/activate'
-        pip_cmd = 'venv/bin/pip'
-    
-    # Install dependencies
-    run_command(f'"{pip_cmd}" install --upgrade pip', 'Pip upgrade')
-    run_command(f'"{pip_cmd}" install -r requirements.txt', 'Dependencies installation')
-    
-    # Create necessary directories
+def create_directories():
+    """Create the directories the application writes to"""
     directories = ['uploads', 'logs', 'static/images', 'static/css', 'static/js']
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
         print(f"📁 Created directory: {directory}")
-    
-    # Copy environment file if it doesn't exist
+
+def copy_env_file():
+    """Copy env.example to .env if no environment file exists yet"""
     if not os.path.exists('.env'):
         if os.path.exists('env.example'):
             shutil.copy('env.example', '.env')
@@ -67,6 +63,29 @@ def setup_environment():
             print("⚠️  Please update .env with your actual configuration values")
         else:
             print("⚠️  No .env file found. Please create one with your configuration")
+
+def setup_environment():
+    """Setup the development environment"""
+    print("🛠️ Setting up development environment...")
+    
+    # Skip pip's startup check against PyPI for a newer pip
+    os.environ['PIP_DISABLE_PIP_VERSION_CHECK'] = '1'
+    
+    # Upgrade pip and install dependencies in one resolver pass, preferring wheels
+    # over source builds; pip is run as a module so it can replace itself on Windows.
+    # The install dominates, so directories and .env are set up while it runs.
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        tasks = [
+            executor.submit(
+                run_command,
+                [venv_bin('python'), '-m', 'pip', 'install', '--prefer-binary', '--upgrade', 'pip', '-r', 'requirements.txt'],
+                'Dependencies installation'
+            ),
+            executor.submit(create_directories),
+            executor.submit(copy_env_file)
+        ]
+        for task in tasks:
+            task.result()
     
     print("✅ Environment setup completed")
 
@@ -75,12 +94,7 @@ def setup_database():
     print("🗄️ Setting up database...")
     
     # Check if MySQL is available
-    try:
-        result = subprocess.run('mysql --version', shell=True, capture_output=True, text=True)
-        if result.returncode != 0:
-            print("⚠️  MySQL not found. Please install MySQL and ensure it's running")
-            return
-    except:
+    if shutil.which('mysql') is None:
         print("⚠️  MySQL not found. Please install MySQL and ensure it's running")
         return
     
@@ -98,10 +112,7 @@ def run_tests():
     
     # Check if pytest is installed
     try:
-        if os.name == 'nt':  # Windows
-            run_command('"venv\\Scripts\\pytest" tests/ -v', 'Test execution')
-        else:  # Unix/Linux/macOS
-            run_command('venv/bin/pytest tests/ -v', 'Test execution')
+        run_command([venv_bin('pytest'), 'tests/', '-v'], 'Test execution')
     except:
         print("⚠️  Tests not found or pytest not installed. Skipping tests.")
     
@@ -116,10 +127,7 @@ def start_development():
     os.environ['FLASK_DEBUG'] = 'True'
     
     # Start the Flask application
-    if os.name == 'nt':  # Windows
-        run_command('"venv\\Scripts\\python" run.py', 'Development server startup')
-    else:  # Unix/Linux/macOS
-        run_command('venv/bin/python run.py', 'Development server startup')
+    run_command([venv_bin('python'), 'run.py'], 'Development server startup')
 
 def deploy_production():
     """Deploy to production"""
@@ -127,10 +135,7 @@ def deploy_production():
     
     # Check if gunicorn is installed
     try:
-        if os.name == 'nt':  # Windows
-            run_command('"venv\\Scripts\\pip" install gunicorn', 'Gunicorn installation')
-        else:  # Unix/Linux/macOS
-            run_command('venv/bin/pip install gunicorn', 'Gunicorn installation')
+        run_command([venv_bin('python'), '-m', 'pip', 'install', 'gunicorn'], 'Gunicorn installation')
     except:
         print("⚠️  Failed to install gunicorn")
     
@@ -141,7 +146,8 @@ def deploy_production():
     print("1. Update .env file with production settings")
     print("2. Set SECRET_KEY to a secure random value")
     print("3. Configure production database")
-    print("4. Run: gunicorn -w 4 -b 0.0.0.0:5000 run:app")
+    print("4. Upgrading an existing database? Run: python upgrade.py")
+    print("5. Run: gunicorn -w 4 -b 0.0.0.0:5000 run:app")
     
     print("✅ Production deployment instructions provided")
 
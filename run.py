@@ -19,9 +19,14 @@ if __name__ == '__main__':
     print("👥 Multi-Role Support: Students, Teachers, Parents, Admins")
     print("🎨 Age-Adaptive Interface: Children, Teens, Young Adults, Adults")
     
-    # Run the application
-    app.run(
-        host='0.0.0.0',
-        port=5000,
-        debug=True
-    )
+    # Serve production traffic with waitress; the Werkzeug server and its reloader are for development only
+    if os.getenv('FLASK_ENV') == 'production':
+        from waitress import serve
+        serve(app, host='0.0.0.0', port=int(os.getenv('PORT', 5000)), threads=8)
+    else:
+        app.run(
+            host='0.0.0.0',
+            port=int(os.getenv('PORT', 5000)),
+            debug=True,
+            use_reloader=True
+        )
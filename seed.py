@@ -4,8 +4,7 @@ Creates sample users (student, teacher, parent, admin) and lessons for testing d
 """
 
 from app import create_app, db
-from database.models import User, UserRole, AgeGroup, Lesson
-from werkzeug.security import generate_password_hash
+from database.models import User, UserRole, AgeGroup, Lesson, ContentFormat, password_hasher, bulk_insert
 
 app = create_app('development')
 
@@ -13,23 +12,31 @@ with app.app_context():
     db.drop_all()
     db.create_all()
 
-    # Create sample users
-    users = [
-        User(username='student1', email='student1@example.com', password_hash=generate_password_hash('password'), role=UserRole.student, age_group=AgeGroup.children),
-        User(username='teacher1', email='teacher1@example.com', password_hash=generate_password_hash('password'), role=UserRole.teacher, age_group=AgeGroup.young_adults),
-        User(username='parent1', email='parent1@example.com', password_hash=generate_password_hash('password'), role=UserRole.parent, age_group=AgeGroup.adults),
-        User(username='admin1', email='admin1@example.com', password_hash=generate_password_hash('password'), role=UserRole.admin, age_group=AgeGroup.adults)
+    # Every sample account shares one password, so hash it once
+    password_hash = password_hasher.hash('password')
+
+    # Create sample users in bulk
+    user_rows = [
+        {'username': 'student1', 'email': 'student1@example.com', 'first_name': 'Sample', 'last_name': 'Student', 'role': UserRole.STUDENT, 'age_group': AgeGroup.CHILDREN},
+        {'username': 'teacher1', 'email': 'teacher1@example.com', 'first_name': 'Sample', 'last_name': 'Teacher', 'role': UserRole.TEACHER, 'age_group': AgeGroup.YOUNG_ADULTS},
+        {'username': 'parent1', 'email': 'parent1@example.com', 'first_name': 'Sample', 'last_name': 'Parent', 'role': UserRole.PARENT, 'age_group': AgeGroup.ADULTS},
+        {'username': 'admin1', 'email': 'admin1@example.com', 'first_name': 'Sample', 'last_name': 'Admin', 'role': UserRole.ADMIN, 'age_group': AgeGroup.ADULTS}
     ]
-    db.session.add_all(users)
-
-    # Create sample lessons
-    lessons = [
-        Lesson(title='Math Basics', description='Introduction to basic math concepts.', age_group_target='children', is_published=True),
-        Lesson(title='Physics for Teens', description='Fundamentals of physics for teenagers.', age_group_target='teens', is_published=True),
-        Lesson(title='Career Skills', description='Professional skills for young adults.', age_group_target='young_adults', is_published=True),
-        Lesson(title='Financial Literacy', description='Money management for adults.', age_group_target='adults', is_published=True)
+    bulk_insert(User, [dict(row, password_hash=password_hash) for row in user_rows])
+
+    teacher_id = db.session.query(User.id).filter_by(username='teacher1').scalar()
+
+    # Create sample lessons in bulk
+    lesson_rows = [
+        {'title': 'Math Basics', 'description': 'Introduction to basic math concepts.', 'topic': 'Arithmetic', 'subject': 'mathematics', 'age_group_target': AgeGroup.CHILDREN},
+        {'title': 'Physics for Teens', 'description': 'Fundamentals of physics for teenagers.', 'topic': 'Physics', 'subject': 'science', 'age_group_target': AgeGroup.TEENS},
+        {'title': 'Career Skills', 'description': 'Professional skills for young adults.', 'topic': 'Careers', 'subject': 'life_skills', 'age_group_target': AgeGroup.YOUNG_ADULTS},
+        {'title': 'Financial Literacy', 'description': 'Money management for adults.', 'topic': 'Personal Finance', 'subject': 'finance', 'age_group_target': AgeGroup.ADULTS}
     ]
-    db.session.add_all(lessons)
+    bulk_insert(Lesson, [
+        dict(row, format_type=ContentFormat.TEXT, teacher_id=teacher_id, is_published=True)
+        for row in lesson_rows
+    ])
 
     db.session.commit()
     print('✅ Database seeded with sample users and lessons.')
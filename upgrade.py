@@ -0,0 +1,201 @@
+"""
+Upgrade script for EduMorph
+Brings a database created by an earlier release up to the current models.
+
+db.create_all() only creates missing tables and never alters existing ones, so
+changes to existing tables and data derived from earlier rows are applied here.
+Every step is idempotent, so the script is safe to run more than once.
+
+Usage: python upgrade.py   (uses FLASK_ENV and DATABASE_URL like run.py)
+"""
+
+import os
+from sqlalchemy import inspect, text, select, update, bindparam
+from app import create_app, db
+from database.models import SearchIndex, DEFAULT_PREFERENCES, preference_overrides, search_terms_in, insert_search_terms, utcnow
+
+def migrate_user_preferences(connection):
+    """
+    Fold the per-preference user columns into the preferences JSON column, keeping
+    only the values that differ from DEFAULT_PREFERENCES, then drop the old columns.
+    """
+    columns = {column['name'] for column in inspect(connection).get_columns('users')}
+    legacy_columns = [key for key in DEFAULT_PREFERENCES if key in columns]
+    
+    if 'preferences' not in columns:
+        connection.execute(text('ALTER TABLE users ADD COLUMN preferences JSON'))
+    elif not legacy_columns:
+        print('✅ User preferences already migrated')
+        return
+    
+    users = db.Table('users', db.MetaData(), autoload_with=connection)
+    rows = connection.execute(
+        select(users.c.id, users.c.preferences, *[users.c[key] for key in legacy_columns])
+    ).mappings().all()
+    
+    updates = []
+    for row in rows:
+        preferences = {}
+        for key in legacy_columns:
+            value = row[key]
+            if value is None:
+                continue
+            # MySQL returns BOOLEAN columns as 0/1
+            preferences[key] = bool(value) if isinstance(DEFAULT_PREFERENCES[key], bool) else value
+        
+        # Values already in the JSON column win, in case an earlier run was interrupted
+        preferences.update(row['preferences'] or {})
+        updates.append({'user_id': row['id'], 'new_preferences': preference_overrides(preferences)})
+    
+    if updates:
+        connection.execute(
+            update(users).where(users.c.id == bindparam('user_id')).values(preferences=bindparam('new_preferences')),
+            updates
+        )
+    
+    # SQLite cannot add NOT NULL to an existing column; the model still always writes one
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        connection.execute(text('ALTER TABLE users MODIFY preferences JSON NOT NULL'))
+    elif dialect == 'postgresql':
+        connection.execute(text('ALTER TABLE users ALTER COLUMN preferences SET NOT NULL'))
+    
+    for key in legacy_columns:
+        connection.execute(text(f'ALTER TABLE users DROP COLUMN {key}'))
+    
+    print(f'✅ Migrated preferences of {len(updates)} users and dropped {len(legacy_columns)} old columns')
+
+def timestamp_default_columns():
+    """Yield each model table with its columns the database fills with the current time."""
+    for table in db.metadata.sorted_tables:
+        columns = [column for column in table.columns if isinstance(getattr(column.server_default, 'arg', None), utcnow)]
+        if columns:
+            yield table, columns
+
+def rebuild_sqlite_table(connection, table, existing_columns):
+    """Recreate a SQLite table from its model and copy its rows over; SQLite cannot alter a column."""
+    preparer = connection.dialect.identifier_preparer
+    old_name = f'{table.name}_before_upgrade'
+    
+    # Keep other tables' foreign keys pointing at the table name rather than the renamed copy
+    connection.exec_driver_sql('PRAGMA legacy_alter_table = ON')
+    connection.execute(text(f'ALTER TABLE {preparer.format_table(table)} RENAME TO {preparer.quote(old_name)}'))
+    
+    # The renamed table keeps its index names, which the model's indexes reuse
+    for index in inspect(connection).get_indexes(old_name):
+        connection.execute(text(f'DROP INDEX {preparer.quote(index["name"])}'))
+    table.create(connection)
+    
+    columns = ', '.join(preparer.format_column(column) for column in table.columns if column.name in existing_columns)
+    connection.execute(text(f'INSERT INTO {preparer.format_table(table)} ({columns}) SELECT {columns} FROM {preparer.quote(old_name)}'))
+    connection.execute(text(f'DROP TABLE {preparer.quote(old_name)}'))
+    connection.exec_driver_sql('PRAGMA legacy_alter_table = OFF')
+
+def add_timestamp_defaults(connection):
+    """
+    Give timestamp columns their database default. The models leave these columns to the
+    database, so tables created by an earlier release would otherwise store NULL.
+    """
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    tables = 0
+    for table, columns in timestamp_default_columns():
+        defaults = {column['name']: column['default'] for column in inspect(connection).get_columns(table.name)}
+        missing = [column for column in columns if column.name in defaults and defaults[column.name] is None]
+        if not missing:
+            continue
+        
+        tables += 1
+        if dialect.name == 'sqlite':
+            rebuild_sqlite_table(connection, table, defaults)
+            continue
+        
+        for column in missing:
+            default = column.server_default.arg.compile(dialect=dialect)
+            if dialect.name == 'mysql':
+                # MySQL only accepts CURRENT_TIMESTAMP as a default in a full column definition
+                connection.execute(text(
+                    f'ALTER TABLE {preparer.format_table(table)} MODIFY {preparer.format_column(column)} '
+                    f'{column.type.compile(dialect=dialect)} NULL DEFAULT {default}'
+                ))
+            else:
+                connection.execute(text(
+                    f'ALTER TABLE {preparer.format_table(table)} ALTER COLUMN {preparer.format_column(column)} SET DEFAULT {default}'
+                ))
+    
+    if tables:
+        print(f'✅ Added timestamp defaults to {tables} tables')
+    else:
+        print('✅ Timestamp defaults already in place')
+
+def existing_index_names(connection, table_name):
+    """Names of the indexes a table already has."""
+    # Reflection skips expression indexes, such as the multi-valued tags index, so ask the catalog
+    if connection.dialect.name == 'mysql':
+        return set(connection.execute(
+            text('SELECT DISTINCT index_name FROM information_schema.statistics '
+                 'WHERE table_schema = DATABASE() AND table_name = :table_name'),
+            {'table_name': table_name}
+        ).scalars())
+    if connection.dialect.name == 'sqlite':
+        return set(connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table_name"),
+            {'table_name': table_name}
+        ).scalars())
+    return {index['name'] for index in inspect(connection).get_indexes(table_name)}
+
+def create_missing_indexes(connection):
+    """Create the model indexes an existing table lacks, including MySQL's FULLTEXT indexes that search needs."""
+    created = []
+    for table in db.metadata.sorted_tables:
+        existing = existing_index_names(connection, table.name)
+        missing = [index for index in table.indexes if index.name not in existing]
+        if not missing:
+            continue
+        
+        # Indexes declared for one dialect only are skipped on the others
+        for index in missing:
+            index.create(connection)
+        existing = existing_index_names(connection, table.name)
+        created += [index.name for index in missing if index.name in existing]
+    
+    if created:
+        print(f'✅ Created indexes {", ".join(created)}')
+    else:
+        print('✅ Indexes already in place')
+
+# Search index rows read per batch while backfilling the autocomplete vocabulary
+SEARCH_TERM_BACKFILL_BATCH_SIZE = 1000
+
+def backfill_search_terms(connection):
+    """Add the words of every existing search index row to the autocomplete vocabulary."""
+    # Page by id rather than streaming one result, so the inserts can share the connection
+    last_id = 0
+    rows = 0
+    while True:
+        batch = connection.execute(
+            select(SearchIndex.id, SearchIndex.searchable_text)
+            .where(SearchIndex.id > last_id)
+            .order_by(SearchIndex.id)
+            .limit(SEARCH_TERM_BACKFILL_BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+        
+        insert_search_terms(connection, set().union(*[search_terms_in(text) for _, text in batch]))
+        last_id = batch[-1].id
+        rows += len(batch)
+    
+    print(f'✅ Added autocomplete terms from {rows} search index rows')
+
+if __name__ == '__main__':
+    app = create_app(os.getenv('FLASK_ENV', 'development'))
+    
+    with app.app_context():
+        with db.engine.begin() as connection:
+            migrate_user_preferences(connection)
+            add_timestamp_defaults(connection)
+            create_missing_indexes(connection)
+            backfill_search_terms(connection)
+    
+    print('🎉 Database upgrade completed')